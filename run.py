@@ -8,6 +8,10 @@ paths = {
     # optionnels
     # "travaux":      "data/inputs/travaux.csv",
     "costs_yaml":      "configs/costs.yaml",
+    "project_yaml":    "configs/project.yaml",
+    # géométries pour le zonage des équipes (geopandas requis)
+    "infra_shp":       "data/inputs/infrastructures.shp",
+    "batiments_shp":   "data/inputs/batiments.shp",
 }
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+# src/analytics/curves.py
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+import numpy as np
+import pandas as pd
+
+# Paliers de maisons raccordées pour lesquels on veut le coût nécessaire
+HOUSE_MARKERS = (0.50, 0.80, 0.95)
+
+
+def _houses_by_building(plan_df: pd.DataFrame, df_bat: pd.DataFrame | None) -> pd.Series:
+    """nb de maisons par bâtiment (base bâtiments si fournie, sinon le plan)."""
+    if df_bat is not None and "nb_maisons" in df_bat.columns:
+        s = df_bat.set_index(df_bat["id_batiment"].astype(str))["nb_maisons"]
+    else:
+        s = plan_df.set_index(plan_df["id_batiment"].astype(str))["nb_houses"]
+    s = pd.to_numeric(s, errors="coerce").fillna(0)
+    return s[~s.index.duplicated(keep="first")]
+
+
+class ExecutionTrace:
+    """
+    Trace compacte de work orders parcourus dans l'ordre d'exécution, lot par lot :
+    coût / heures / plan_order / phase par ligne et dernière position de chaque bâtiment
+    et de chaque tronçon. Suffit aux courbes et au retard de raccordement sans garder
+    work_orders en mémoire (mode streaming).
+    """
+
+    def __init__(self):
+        self._cols: Dict[str, list] = {"cost": [], "time": [], "order": [], "phase": []}
+        self._last: Dict[str, list] = {"id_batiment": [], "infra_id": []}
+        self.n = 0
+
+    def add(self, work_orders: pd.DataFrame) -> None:
+        pos = np.arange(self.n, self.n + len(work_orders))
+        self.n += len(work_orders)
+        self._cols["cost"].append(pd.to_numeric(work_orders["cost_total"], errors="coerce").fillna(0).to_numpy(float))
+        self._cols["time"].append(pd.to_numeric(work_orders["time_total_h"], errors="coerce").fillna(0).to_numpy(float))
+        self._cols["order"].append(work_orders["plan_order"].to_numpy(dtype=np.int64))
+        self._cols["phase"].append(pd.to_numeric(work_orders["phase"], errors="coerce").to_numpy(float))
+        for key, parts in self._last.items():
+            parts.append(pd.Series(pos).groupby(work_orders[key].astype(str).to_numpy(), sort=False).max())
+
+    def column(self, name: str) -> np.ndarray:
+        parts = self._cols[name]
+        if len(parts) != 1:
+            parts[:] = [np.concatenate(parts) if parts else np.array([], dtype=float)]
+        return parts[0]
+
+    def last_position(self, key: str) -> pd.Series:
+        parts = self._last[key]
+        if len(parts) != 1:
+            s = pd.concat(parts) if parts else pd.Series(dtype=np.int64)
+            parts[:] = [s.groupby(level=0, sort=False).max()]
+        return parts[0]
+
+
+def _trace(work_orders: "pd.DataFrame | ExecutionTrace") -> ExecutionTrace:
+    if isinstance(work_orders, ExecutionTrace):
+        return work_orders
+    t = ExecutionTrace()
+    t.add(work_orders)
+    return t
+
+
+def _completion_position(trace: ExecutionTrace,
+                         fanout: pd.DataFrame | None) -> pd.Series:
+    """
+    Position (ligne de work_orders) à laquelle chaque bâtiment est raccordé :
+    c'est la dernière tâche qui le concerne dans l'ordre d'exécution.
+    """
+    if fanout is None:
+        # une ligne = (bâtiment, tronçon)
+        return trace.last_position("id_batiment")
+    # une ligne = un tronçon, la table fan-out donne bâtiment ↔ tronçon
+    pos = trace.last_position("infra_id").reindex(fanout["infra_id"].astype(str).to_numpy())
+    pairs = pd.DataFrame({"id_batiment": fanout["id_batiment"].astype(str).to_numpy(),
+                          "pos": pos.to_numpy()}).dropna()
+    return pairs.groupby("id_batiment", sort=False)["pos"].max().astype(np.int64)
+
+
+def compute_reconnection_curves(
+    plan_df: pd.DataFrame,
+    work_orders: "pd.DataFrame | ExecutionTrace",
+    df_bat: pd.DataFrame | None = None,
+    fanout: pd.DataFrame | None = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """
+    Courbes maisons/bâtiments raccordés vs coût et heures cumulés, en une passe
+    vectorisée (sommes préfixes) sur work_orders, supposé dans l'ordre du plan
+    (chaque plan_order forme une plage contiguë : à calculer avant le séquencement).
+    work_orders peut être remplacé par sa trace (ExecutionTrace alimentée lot par lot) ;
+    plan_df : id_batiment et nb_houses suffisent.
+
+    Retourne (curve_steps, curve_phases, markers) :
+      - curve_steps : une ligne par étape du plan (plan_order), + ligne -1 = sans travaux
+      - curve_phases : une ligne par phase
+      - markers : coût/heures pour atteindre 50/80/95 % des maisons
+    """
+    trace = _trace(work_orders)
+    n = trace.n
+    houses = _houses_by_building(plan_df, df_bat)
+    done_at = _completion_position(trace, fanout)
+
+    # bâtiments sans tâche (phase 0 du plan) => raccordés dès le départ (position -1)
+    all_bats = houses.index.union(done_at.index)
+    pos = done_at.reindex(all_bats).fillna(-1).to_numpy(dtype=np.int64)
+    h = houses.reindex(all_bats).fillna(0).to_numpy(dtype=float)
+
+    # événements par position (décalés de 1 : l'indice 0 = avant la 1re tâche)
+    houses_cum = np.cumsum(np.bincount(pos + 1, weights=h, minlength=n + 1))
+    bats_cum = np.cumsum(np.bincount(pos + 1, minlength=n + 1)).astype(float)
+    cost = np.concatenate([[0.0], trace.column("cost")])
+    time = np.concatenate([[0.0], trace.column("time")])
+    cost_cum = np.cumsum(cost)
+    time_cum = np.cumsum(time)
+    total_houses = float(houses_cum[-1])
+
+    # ---- courbe par étape : fin de chaque plage contiguë de plan_order ----
+    order = np.concatenate([[-1], trace.column("order")]).astype(np.int64)
+    phase = np.concatenate([[np.nan], trace.column("phase")])
+    ends = np.flatnonzero(np.append(order[1:] != order[:-1], True))
+    starts = np.concatenate([[0], ends[:-1]])
+
+    # plan_order 0 = hôpital, k >= 1 = k-ième ligne du plan, 10**9 = hors plan
+    labels = np.concatenate([["hopital"], plan_df["id_batiment"].astype(str).to_numpy()]).astype(object)
+    step_order = order[ends]
+    known = (step_order >= 0) & (step_order < len(labels))
+    step_bat = np.where(known, labels[np.where(known, step_order, 0)], None)
+
+    gained = np.diff(np.concatenate([[0.0], houses_cum[ends]]))
+    cost_step = cost_cum[ends] - np.concatenate([[0.0], cost_cum[starts[1:]]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        marginal = np.where(gained > 0, cost_step / gained, np.nan)
+
+    curve_steps = pd.DataFrame({
+        "plan_order": step_order,
+        "id_batiment": step_bat,
+        "phase": phase[ends],
+        "n_tasks": ends - starts,
+        "cost_step": cost_step,
+        "time_step_h": time_cum[ends] - np.concatenate([[0.0], time_cum[starts[1:]]]),
+        "houses_gained": gained,
+        "cost_cum": cost_cum[ends],
+        "time_cum_h": time_cum[ends],
+        "houses_cum": houses_cum[ends],
+        "buildings_cum": bats_cum[ends],
+        "houses_pct": houses_cum[ends] / max(total_houses, 1e-9),
+        "marginal_cost_per_house": marginal,
+    })
+
+    # ---- courbe par phase : fin de chaque plage contiguë de phase ----
+    ph = phase[1:]
+    if n:
+        change = np.append(~((ph[1:] == ph[:-1]) | (np.isnan(ph[1:]) & np.isnan(ph[:-1]))), True)
+        p_ends = np.flatnonzero(change) + 1
+    else:
+        p_ends = np.array([], dtype=np.int64)
+    p_prev = np.concatenate([[0], p_ends[:-1]])
+    p_cost = cost_cum[p_ends] - cost_cum[p_prev]
+    p_gain = houses_cum[p_ends] - houses_cum[p_prev]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_cph = np.where(p_gain > 0, p_cost / p_gain, np.nan)
+
+    curve_phases = pd.DataFrame({
+        "phase": phase[p_ends],
+        "cost_phase": p_cost,
+        "time_phase_h": time_cum[p_ends] - time_cum[p_prev],
+        "houses_gained": p_gain,
+        "cost_cum": cost_cum[p_ends],
+        "time_cum_h": time_cum[p_ends],
+        "houses_cum": houses_cum[p_ends],
+        "buildings_cum": bats_cum[p_ends],
+        "houses_pct": houses_cum[p_ends] / max(total_houses, 1e-9),
+        "cost_per_house": p_cph,
+    })
+
+    # ---- marqueurs : 1re position où l'on atteint q % des maisons ----
+    markers: Dict[str, Any] = {
+        "total_houses": total_houses,
+        "total_buildings": float(bats_cum[-1]),
+        "houses_without_works": float(houses_cum[0]),
+        "cost_total": float(cost_cum[-1]),
+        "time_total_h": float(time_cum[-1]),
+    }
+    for q in HOUSE_MARKERS:
+        i = int(np.searchsorted(houses_cum, q * total_houses - 1e-9, side="left"))
+        key = f"p{int(round(q * 100))}"
+        if total_houses <= 0 or i > n:
+            markers[key] = None
+            continue
+        markers[key] = {
+            "cost_cum": float(cost_cum[i]),
+            "time_cum_h": float(time_cum[i]),
+            "plan_order": int(order[i]),
+            "phase": None if np.isnan(phase[i]) else float(phase[i]),
+            "houses_cum": float(houses_cum[i]),
+        }
+
+    return curve_steps, curve_phases, markers
+
+
+def _completion_time(trace: ExecutionTrace, fanout: pd.DataFrame | None) -> pd.Series:
+    """Heures de travaux cumulées au raccordement de chaque bâtiment (ordre des lignes de work_orders)."""
+    time_cum = np.cumsum(trace.column("time"))
+    done_at = _completion_position(trace, fanout)
+    return pd.Series(time_cum[done_at.to_numpy()], index=done_at.index)
+
+
+def reconnection_delay(plan_df: pd.DataFrame,
+                       before: "pd.DataFrame | ExecutionTrace",
+                       after: "pd.DataFrame | ExecutionTrace",
+                       df_bat: pd.DataFrame | None = None,
+                       fanout: pd.DataFrame | None = None) -> Dict[str, Any]:
+    """
+    Effet d'un réordonnancement des work orders (ex. séquencement) sur le raccordement :
+    décalage, en heures de travaux cumulées, de l'instant où chaque bâtiment est raccordé,
+    pondéré par le nb de maisons (> 0 = raccordé plus tard). before / after : work_orders
+    ou leurs traces (ExecutionTrace).
+    """
+    houses = _houses_by_building(plan_df, df_bat)
+    t0 = _completion_time(_trace(before), fanout)
+    t1 = _completion_time(_trace(after), fanout).reindex(t0.index)
+    shift = (t1 - t0).to_numpy(float)
+    h = houses.reindex(t0.index).fillna(0).to_numpy(float)
+    late, early = shift > 1e-9, shift < -1e-9
+    return {
+        "buildings_delayed": int(late.sum()),
+        "houses_delayed": float(h[late].sum()),
+        "houses_advanced": float(h[early].sum()),
+        "mean_shift_h": float(np.dot(h, shift) / h.sum()) if h.sum() > 0 else 0.0,
+        "mean_delay_h_delayed": float(np.dot(h[late], shift[late]) / h[late].sum()) if h[late].sum() > 0 else 0.0,
+        "max_delay_h": float(shift.max(initial=0.0)),
+    }
+
+
+def curves_report(curve_phases: pd.DataFrame, markers: Dict[str, Any]) -> Dict[str, Any]:
+    """Synthèse JSON-isable (marqueurs + courbe par phase), à déposer à côté de kpi_baseline.json."""
+    phases = curve_phases.astype(object).where(curve_phases.notna(), None)
+    return {"markers": markers, "phases": phases.to_dict(orient="records")}
@@ -0,0 +1,166 @@
+# src/analytics/plan_components.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+import heapq
+import os
+import numpy as np
+import pandas as pd
+
+from src.analytics.plan_greedy import iter_plan_steps
+
+# en dessous, le coût de démarrage des processus dépasse le gain
+MIN_BUILDINGS_FOR_POOL = 2_000
+
+
+# ------------------------
+# Composantes connexes
+# ------------------------
+
+def _union_find(u: np.ndarray, v: np.ndarray, n: int) -> np.ndarray:
+    """
+    Union-find vectorisé (accrochage au plus petit label + compression par sauts de pointeurs).
+    Renvoie pour chaque nœud le plus petit indice de sa composante.
+    """
+    parent = np.arange(n)
+    while True:
+        pu, pv = parent[u], parent[v]
+        diff = pu != pv
+        if not diff.any():
+            return parent
+        lo = np.minimum(pu[diff], pv[diff])
+        hi = np.maximum(pu[diff], pv[diff])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            nxt = parent[parent]
+            if np.array_equal(nxt, parent):
+                break
+            parent = nxt
+
+
+def _is_damaged(df_sync: pd.DataFrame) -> np.ndarray:
+    # même règle que build_graph : état logique != "infra_intacte"
+    return (df_sync["infra_type"].astype(str).str.lower() != "infra_intacte").to_numpy()
+
+
+def find_components(df_sync: pd.DataFrame) -> pd.Series:
+    """
+    Composantes du graphe biparti bâtiment ↔ infra endommagée.
+    Renvoie id_batiment -> label de composante (bâtiments ayant au moins 1 infra à réparer).
+    """
+    dmg = df_sync.loc[_is_damaged(df_sync), ["id_batiment", "infra_id"]].astype(str)
+    b_codes, b_ids = pd.factorize(dmg["id_batiment"])
+    i_codes, _ = pd.factorize(dmg["infra_id"])
+    nb = len(b_ids)
+    parent = _union_find(b_codes, i_codes + nb, nb + int(i_codes.max(initial=-1)) + 1)
+    labels, _ = pd.factorize(parent[:nb])
+    return pd.Series(labels, index=pd.Index(b_ids, name="id_batiment"), name="component")
+
+
+# ------------------------
+# Planification par composante
+# ------------------------
+
+def _component_steps(df_sub: pd.DataFrame, bat_sub: pd.DataFrame) -> Iterator[dict]:
+    """Étapes d'une composante (hors étape 0, sans n° d'étape), produites à la demande."""
+    for row in iter_plan_steps(df_sub, bat_sub):
+        if row["step"] > 0:
+            row.pop("step")
+            yield row
+
+
+def _plan_chunk(chunk: List[Tuple[pd.DataFrame, pd.DataFrame]]) -> List[List[dict]]:
+    """Worker : glouton sur chaque composante du lot, séquences d'étapes (sans n° d'étape)."""
+    return [list(_component_steps(df_sub, bat_sub)) for df_sub, bat_sub in chunk]
+
+
+def _pooled_sequences(problems: List[Tuple[pd.DataFrame, pd.DataFrame]], sizes: np.ndarray,
+                      pool: ProcessPoolExecutor, n_chunks: int) -> List[Iterator[dict]]:
+    """Lots de composantes soumis au pool ; chaque séquence attend le résultat de son lot à la 1re lecture."""
+    def _lazy(fut, k: int) -> Iterator[dict]:
+        yield from fut.result()[k]
+
+    sequences: List[Iterator[dict]] = [iter(()) for _ in problems]
+    for ch in _balanced_chunks(sizes, n_chunks):
+        fut = pool.submit(_plan_chunk, [problems[c] for c in ch])
+        for k, c in enumerate(ch):
+            sequences[c] = _lazy(fut, k)
+    return sequences
+
+
+def _balanced_chunks(sizes: np.ndarray, n_chunks: int) -> List[List[int]]:
+    """Répartit les composantes (plus grosses d'abord) dans le lot le moins chargé."""
+    loads = [(0, k) for k in range(n_chunks)]
+    chunks: List[List[int]] = [[] for _ in range(n_chunks)]
+    for c in np.argsort(-sizes, kind="stable"):
+        load, k = heapq.heappop(loads)
+        chunks[k].append(int(c))
+        heapq.heappush(loads, (load + int(sizes[c]) ** 2, k))  # glouton ~ O(n²) par composante
+    return [ch for ch in chunks if ch]
+
+
+def _merge_steps(sequences: List[Iterator[dict]]) -> Iterator[dict]:
+    """Fusion k-voies : la tête d'une composante ne dépend que de ses propres réparations."""
+    merged = heapq.merge(*sequences, key=lambda r: (r["building_difficulty_before"], r["id_batiment"]))
+    for step, row in enumerate(merged, start=1):
+        yield {"step": step, **row}
+
+
+def iter_plan_steps_by_components(df_sync: pd.DataFrame,
+                                  df_bat_base: pd.DataFrame,
+                                  max_workers: int | None = None) -> Iterator[dict]:
+    """
+    Mêmes étapes que iter_plan_steps, calculées par composantes indépendantes :
+      - phase 0 : bâtiments sans infra à réparer (étape 0, triés par id)
+      - chaque composante a son propre générateur iter_plan_steps, avancé seulement quand
+        sa tête est consommée (gros réseaux : composantes calculées par lots dans un pool de
+        processus, la fusion démarre quand chaque lot a rendu sa séquence)
+      - fusion k-voies (tas) des séquences sur (difficulté avant, id) : à chaque pas on prend
+        la tête la moins difficile, exactement comme la boucle globale.
+    """
+    comp = find_components(df_sync)
+
+    bat_ids = df_bat_base["id_batiment"].astype(str)
+    phase0 = df_bat_base[~bat_ids.isin(comp.index)]
+    for _, row in phase0.assign(_id=bat_ids).sort_values("_id").iterrows():
+        yield {
+            "step": 0,
+            "id_batiment": row["_id"],
+            "type_batiment": str(row.get("type_batiment", "habitation")),
+            "nb_houses": int(row["nb_maisons"]),
+            "building_difficulty_before": 0.0,
+            "repaired_infras": [],
+        }
+
+    # sous-problèmes : toutes les lignes réseau des bâtiments de la composante
+    sync_comp = df_sync["id_batiment"].astype(str).map(comp)
+    bat_comp = bat_ids.map(comp)
+    n_comp = int(comp.max()) + 1 if len(comp) else 0
+    sub_sync = dict(list(df_sync[sync_comp.notna()].groupby(sync_comp.dropna().astype(int), sort=False)))
+    sub_bat = dict(list(df_bat_base[bat_comp.notna()].groupby(bat_comp.dropna().astype(int), sort=False)))
+    problems = [(sub_sync[c], sub_bat[c]) for c in range(n_comp)]
+
+    workers = max_workers or os.cpu_count() or 1
+    sizes = np.bincount(comp.to_numpy(), minlength=n_comp)
+    if workers <= 1 or n_comp <= 1 or len(comp) < MIN_BUILDINGS_FOR_POOL:
+        yield from _merge_steps([_component_steps(*pb) for pb in problems])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from _merge_steps(_pooled_sequences(problems, sizes, pool, workers * 4))
+
+
+def greedy_plan_by_components(df_sync: pd.DataFrame,
+                              df_bat_base: pd.DataFrame,
+                              max_workers: int | None = None) -> pd.DataFrame:
+    """Même résultat que greedy_plan (voir iter_plan_steps_by_components)."""
+    return pd.DataFrame(list(iter_plan_steps_by_components(df_sync, df_bat_base, max_workers)))
+
+
+def components_summary(df_sync: pd.DataFrame) -> Dict[str, float]:
+    """Trace : nombre et taille des composantes."""
+    sizes = find_components(df_sync).value_counts()
+    return {
+        "n_components": int(len(sizes)),
+        "largest": int(sizes.max()) if len(sizes) else 0,
+        "singletons": int((sizes == 1).sum()),
+    }
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 import pandas as pd
 
 
@@ -106,15 +106,15 @@ def phase0_buildings(bats: Dict[str, Batiment]) -> List[str]:
 # Algo glouton demandé
 # ------------------------
 
-def greedy_plan(df_sync: pd.DataFrame,
-                df_bat_base: pd.DataFrame) -> pd.DataFrame:
+def iter_plan_steps(df_sync: pd.DataFrame,
+                    df_bat_base: pd.DataFrame) -> Iterator[dict]:
     """
     Mission:
       - prioriser les bâtiments les plus simples (difficulté min),
       - maximiser implicitement les prises via la mutualisation,
       - réparer toutes les infras du bâtiment choisi à chaque itération.
 
-    Renvoie un DataFrame des étapes avec:
+    Générateur : produit chaque étape dès qu'elle est décidée, avec
       step, id_batiment, type_batiment, nb_houses,
       building_difficulty_before, repaired_infras
     """
@@ -127,20 +127,19 @@ def greedy_plan(df_sync: pd.DataFrame,
     impacted = [b for b in bats.values()
                 if any(i.infra_type_state != "infra_intacte" for i in b.list_infras)]
 
-    plan_rows: List[dict] = []
     step = 0
 
     # insérer les phase 0 (étape 0)
     for bid in sorted(phase0):
         b = bats[bid]
-        plan_rows.append({
+        yield {
             "step": 0,
             "id_batiment": b.id_building,
             "type_batiment": b.type_batiment,
             "nb_houses": b.nb_houses,
             "building_difficulty_before": 0.0,
             "repaired_infras": [],
-        })
+        }
 
     # boucle tant qu’il reste des bâtiments impactés
     while impacted:
@@ -158,18 +157,47 @@ def greedy_plan(df_sync: pd.DataFrame,
                 i.repair_infra()
                 repaired_ids.append(i.infra_id)
 
-        plan_rows.append({
+        yield {
             "step": step,
             "id_batiment": choix.id_building,
             "type_batiment": choix.type_batiment,
             "nb_houses": choix.nb_houses,
             "building_difficulty_before": diff_before,
             "repaired_infras": repaired_ids,
-        })
+        }
 
         # filtrer ceux qui ont encore au moins 1 infra à réparer
         impacted = [b for b in impacted
                     if any((not i.repaired) and i.infra_type_state != "infra_intacte"
                            for i in b.list_infras)]
 
-    return pd.DataFrame(plan_rows)
+
+def batch_steps(steps: Iterable[dict], batch_size: int = 256) -> Iterator[pd.DataFrame]:
+    """Regroupe un flux d'étapes en DataFrames de `batch_size` lignes (mémoire bornée)."""
+    batch: List[dict] = []
+    for row in steps:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def iter_greedy_plan(df_sync: pd.DataFrame,
+                     df_bat_base: pd.DataFrame,
+                     batch_size: int = 256) -> Iterator[pd.DataFrame]:
+    """Plan glouton en lots de DataFrames, produits au fil de la décision."""
+    return batch_steps(iter_plan_steps(df_sync, df_bat_base), batch_size)
+
+
+def greedy_plan(df_sync: pd.DataFrame,
+                df_bat_base: pd.DataFrame) -> pd.DataFrame:
+    """
+    Plan glouton complet (voir iter_plan_steps).
+
+    Renvoie un DataFrame des étapes avec:
+      step, id_batiment, type_batiment, nb_houses,
+      building_difficulty_before, repaired_infras
+    """
+    return pd.DataFrame(list(iter_plan_steps(df_sync, df_bat_base)))
@@ -0,0 +1,150 @@
+# src/analytics/risk.py
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+PERCENTILES = (10, 50, 90)
+DEFAULT_SCENARIOS = 5000
+
+
+# ------------------------
+# Tirages
+# ------------------------
+
+def _sample(spec: Any, size: Tuple[int, ...], rng: np.random.Generator) -> np.ndarray:
+    """
+    Tirage vectorisé selon une spec YAML :
+      - nombre                                    -> constante
+      - {dist: triangular, low, mode, high}
+      - {dist: uniform, low, high}
+      - {dist: lognormal, mean, cv}               (moyenne et coefficient de variation)
+      - {dist: choice, values: [...], probs: [...]}
+    """
+    if isinstance(spec, (int, float)):
+        return np.full(size, float(spec))
+    dist = str(spec.get("dist", "triangular")).lower()
+    if dist == "triangular":
+        return rng.triangular(float(spec["low"]), float(spec["mode"]), float(spec["high"]), size)
+    if dist == "uniform":
+        return rng.uniform(float(spec["low"]), float(spec["high"]), size)
+    if dist == "lognormal":
+        mean, cv = float(spec["mean"]), float(spec["cv"])
+        sigma2 = np.log1p(cv ** 2)
+        return rng.lognormal(np.log(mean) - sigma2 / 2.0, np.sqrt(sigma2), size)
+    if dist == "choice":
+        return rng.choice(np.asarray(spec["values"], dtype=float), size=size, p=spec.get("probs"))
+    raise ValueError(f"Distribution inconnue dans simulation: {dist}")
+
+
+def _pct(a: np.ndarray, prefix: str) -> Dict[str, float]:
+    q = np.percentile(a, PERCENTILES, axis=0)
+    return {f"{prefix}_p{p}": float(v) for p, v in zip(PERCENTILES, q)}
+
+
+# ------------------------
+# Simulation
+# ------------------------
+
+def risk_aggregates(work_orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sommes par (phase, type physique) : nb de tâches, longueur, homme·h, matériel.
+    Seule entrée de la simulation : cumulable phase par phase (mode streaming), chaque
+    phase étant complète dans un lot.
+    """
+    wo = work_orders
+    type_col = "type_infra_src" if "type_infra_src" in wo.columns else "type_infra"
+    t = pd.DataFrame({
+        "phase": pd.to_numeric(wo["phase"], errors="coerce").fillna(-1).to_numpy(),
+        "type": wo[type_col].astype(str).str.strip().str.lower().to_numpy(),
+        "longueur": pd.to_numeric(wo["longueur"], errors="coerce").fillna(0.0).to_numpy(float),
+        "man_hours": pd.to_numeric(wo["man_hours"], errors="coerce").fillna(0.0).to_numpy(float),
+        "material_cost": pd.to_numeric(wo["material_cost"], errors="coerce").fillna(0.0).to_numpy(float),
+    })
+    g = t.groupby(["phase", "type"], sort=True)
+    return g.sum().assign(n_tasks=g.size()).reset_index()
+
+
+def simulate_aggregates(agg: pd.DataFrame, cfg: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Monte Carlo des durées/coûts par phase, sans boucle Python par scénario :
+      - longueurs agrégées par (phase, type physique) -> matrice L (P x T)
+      - cadences tirées par scénario et par type       -> H (S x T), homme·h / m
+      - homme·heures par scénario et phase              = H @ L.T  (S x P)
+      - ouvriers disponibles par scénario et phase      -> C (S x P), borné à max_workers_per_infra
+      - durée = homme·h / C ; coût = matériel + homme·h x taux horaire
+    Les types sans distribution gardent leur cadence déterministe (man_hours des work orders).
+    agg : risk_aggregates(work_orders), éventuellement concaténés phase par phase.
+    cfg : contenu de costs.yaml (sections simulation, workforce, hospital).
+    Retourne (synthèse par phase, rapport dont P(hôpital terminé avant la fin du groupe électrogène)).
+    """
+    sim = cfg.get("simulation") or {}
+    n = int(sim.get("n_scenarios", DEFAULT_SCENARIOS))
+    rng = np.random.default_rng(sim.get("seed"))
+    workforce = cfg.get("workforce") or {}
+    wage = float(workforce.get("worker_wage_per_hour", 37.5))
+    crew_max = float(workforce.get("max_workers_per_infra", 4))
+    gen_h = float(cfg["hospital"]["generator_hours"])
+    goal_h = gen_h * (1.0 - float(cfg["hospital"]["time_margin"]))
+
+    phase = agg["phase"].to_numpy(float)
+    ttype = agg["type"].to_numpy()
+    length = agg["longueur"].to_numpy(float)
+    man_h = agg["man_hours"].to_numpy(float)
+    material = agg["material_cost"].to_numpy(float)
+    n_tasks = agg["n_tasks"].to_numpy(np.int64)
+
+    rate_specs: Dict[str, Any] = {str(k).lower(): v for k, v in (sim.get("hours_per_m") or {}).items()}
+    types: List[str] = sorted(rate_specs)
+    phases, p_idx = np.unique(phase, return_inverse=True)
+    t_idx = pd.Index(types).get_indexer(ttype)
+    stoch = t_idx >= 0
+    P, T = len(phases), len(types)
+
+    # agrégats (P x T) et parts déterministes (P)
+    L = np.zeros((P, T))
+    np.add.at(L, (p_idx[stoch], t_idx[stoch]), length[stoch])
+    fixed_mh = np.bincount(p_idx[~stoch], weights=man_h[~stoch], minlength=P)
+    mat_p = np.bincount(p_idx, weights=material, minlength=P)
+
+    # tirages (S x T) et (S x P), puis produit matriciel
+    H = np.column_stack([_sample(rate_specs[t], (n,), rng) for t in types]) if T else np.zeros((n, 0))
+    crew = np.clip(_sample(sim.get("crew_available", crew_max), (n, P), rng), 1.0, crew_max)
+    MH = H @ L.T + fixed_mh                 # homme·heures (S x P)
+    dur = MH / crew                         # heures (S x P)
+    cost = mat_p + MH * wage                # € (S x P)
+    dur_cum = np.cumsum(dur, axis=1)        # fin de phase (phases enchaînées)
+
+    det_mh = np.bincount(p_idx, weights=man_h, minlength=P)
+    rows = []
+    for k, ph in enumerate(phases):
+        rows.append({
+            "phase": float(ph),
+            "n_tasks": int(n_tasks[p_idx == k].sum()),
+            "duration_h_det": float(det_mh[k] / crew_max),
+            **_pct(dur[:, k], "duration_h"),
+            **_pct(dur_cum[:, k], "end_h"),
+            "cost_det": float(mat_p[k] + det_mh[k] * wage),
+            **_pct(cost[:, k], "cost"),
+        })
+    summary = pd.DataFrame(rows)
+
+    report: Dict[str, Any] = {"n_scenarios": n, "seed": sim.get("seed"), "types_stochastic": types}
+    if 0 in phases:
+        h = dur[:, int(np.flatnonzero(phases == 0)[0])]
+        report.update({
+            "generator_hours": gen_h,
+            "hospital_goal_h": goal_h,
+            "p_hospital_before_generator": float(np.mean(h <= gen_h)),
+            "p_hospital_within_margin": float(np.mean(h <= goal_h)),
+            **_pct(h, "hospital_duration_h"),
+        })
+    report.update(_pct(dur.sum(axis=1), "total_duration_h"))
+    report.update(_pct(cost.sum(axis=1), "total_cost"))
+    report["phases"] = summary.to_dict(orient="records")
+    return summary, report
+
+
+def simulate_work_orders(work_orders: pd.DataFrame, cfg: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Monte Carlo sur work_orders complet (cf. simulate_aggregates)."""
+    return simulate_aggregates(risk_aggregates(work_orders), cfg)
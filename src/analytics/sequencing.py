@@ -0,0 +1,251 @@
+# src/analytics/sequencing.py
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import math
+import time
+import numpy as np
+import pandas as pd
+
+from src.analytics.zoning import task_coords
+
+# voisinage de la recherche 2-opt (nb de positions après i) et budget de temps global
+DEFAULT_WINDOW = 50
+DEFAULT_TIME_LIMIT_S = 5.0
+# au-delà de ce rayon (en mailles) la recherche par anneaux passe en force brute
+_MAX_RING = 8
+
+
+def _path_length(x: np.ndarray, y: np.ndarray, start: Tuple[float, float] | None = None) -> float:
+    if len(x) == 0:
+        return 0.0
+    d = float(np.hypot(np.diff(x), np.diff(y)).sum())
+    if start is not None:
+        d += math.hypot(x[0] - start[0], y[0] - start[1])
+    return d
+
+
+# ------------------------
+# Plus proche voisin (grille)
+# ------------------------
+
+def _nn_route(x: np.ndarray, y: np.ndarray, start: Tuple[float, float] | None) -> np.ndarray:
+    """
+    Construction plus-proche-voisin accélérée par une grille de hachage
+    (~2 points par maille) : recherche par anneaux de mailles autour du point courant.
+    """
+    n = len(x)
+    if n <= 1:
+        return np.arange(n)
+    span = max(float(np.ptp(x)), float(np.ptp(y)), 1.0)
+    cell = max(span / math.sqrt(n / 2.0), 1e-6)
+    x0, y0 = float(x.min()), float(y.min())
+    cx = np.floor((x - x0) / cell).astype(np.int64)
+    cy = np.floor((y - y0) / cell).astype(np.int64)
+
+    buckets: Dict[Tuple[int, int], set] = {}
+    for k, key in enumerate(zip(cx.tolist(), cy.tolist())):
+        buckets.setdefault(key, set()).add(k)
+    remaining = np.ones(n, dtype=bool)
+    xs, ys = x.tolist(), y.tolist()
+
+    route: List[int] = []
+    if start is None:
+        cur = 0
+        px, py = xs[0], ys[0]
+    else:
+        cur = -1
+        px, py = start
+    while True:
+        if cur >= 0:
+            remaining[cur] = False
+            buckets[(int(cx[cur]), int(cy[cur]))].discard(cur)
+            route.append(cur)
+            if len(route) == n:
+                break
+        gx, gy = int(math.floor((px - x0) / cell)), int(math.floor((py - y0) / cell))
+        best, best_d = -1, math.inf
+        for r in range(_MAX_RING + 1):
+            for i in range(gx - r, gx + r + 1):
+                for j in (range(gy - r, gy + r + 1) if abs(i - gx) == r else (gy - r, gy + r)):
+                    for k in buckets.get((i, j), ()):
+                        d = math.hypot(xs[k] - px, ys[k] - py)
+                        if d < best_d or (d == best_d and k < best):
+                            best, best_d = k, d
+            # tout point hors des anneaux 0..r est à plus de r mailles
+            if best >= 0 and best_d <= r * cell:
+                break
+        else:
+            # zone clairsemée : force brute sur les points restants
+            cand = np.flatnonzero(remaining)
+            best = int(cand[np.argmin(np.hypot(x[cand] - px, y[cand] - py))])
+        cur = best
+        px, py = xs[cur], ys[cur]
+    return np.asarray(route, dtype=np.int64)
+
+
+# ------------------------
+# 2-opt fenêtré
+# ------------------------
+
+def _two_opt(x: np.ndarray, y: np.ndarray, route: np.ndarray,
+             start: Tuple[float, float] | None, window: int, deadline: float) -> np.ndarray:
+    """
+    2-opt sur chemin ouvert (extrémité libre), départ fixé (point d'ancrage ou 1er point).
+    Pour chaque i, les candidats j ∈ ]i+1, i+window] sont évalués en bloc (numpy).
+    S'arrête à convergence ou à l'échéance.
+    """
+    if start is not None:
+        px = np.concatenate([[start[0]], x[route]])
+        py = np.concatenate([[start[1]], y[route]])
+        idx = np.concatenate([[-1], route])
+    else:
+        px, py, idx = x[route].copy(), y[route].copy(), route.copy()
+    m = len(idx)
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(m - 2):
+            if (i & 63) == 0 and time.perf_counter() >= deadline:
+                break
+            js = np.arange(i + 2, min(m, i + 2 + window))
+            if len(js) == 0:
+                continue
+            d_ab = math.hypot(px[i + 1] - px[i], py[i + 1] - py[i])
+            d_ac = np.hypot(px[js] - px[i], py[js] - py[i])
+            nxt = np.minimum(js + 1, m - 1)
+            has_next = js + 1 < m
+            d_bd = np.where(has_next, np.hypot(px[nxt] - px[i + 1], py[nxt] - py[i + 1]), 0.0)
+            d_cd = np.where(has_next, np.hypot(px[nxt] - px[js], py[nxt] - py[js]), 0.0)
+            delta = d_ac + d_bd - d_ab - d_cd
+            b = int(np.argmin(delta))
+            if delta[b] < -1e-9:
+                j = int(js[b])
+                px[i + 1:j + 1] = px[i + 1:j + 1][::-1]
+                py[i + 1:j + 1] = py[i + 1:j + 1][::-1]
+                idx[i + 1:j + 1] = idx[i + 1:j + 1][::-1]
+                improved = True
+    return idx[1:] if start is not None else idx
+
+
+# ------------------------
+# Séquencement des work orders
+# ------------------------
+
+class WorkOrderSequencer:
+    """
+    Séquencement incrémental : work orders reçus par tranches successives (phases complètes,
+    dans l'ordre, cf. iter_phases), chacune réordonnée comme dans sequence_work_orders.
+    Point de départ, cumuls, budget de temps et rapport sont partagés entre tranches : la
+    concaténation des sorties est identique au séquencement du tableau complet.
+    total_cost : dénominateur de pct_cum_all (coût total de toutes les tranches).
+    """
+
+    def __init__(self, infra_xy: pd.DataFrame, bat_xy: pd.DataFrame, total_cost: float,
+                 window: int = DEFAULT_WINDOW, time_limit_s: float = DEFAULT_TIME_LIMIT_S):
+        self.infra_xy, self.bat_xy = infra_xy, bat_xy
+        self.total_cost = float(total_cost)
+        self.window = window
+        self.t0 = time.perf_counter()
+        self.deadline = self.t0 + max(time_limit_s, 0.0)
+        self.n_tasks = self.n_groups = self.n_without_coords = 0
+        self.before = self.after = 0.0
+        self.cost_cum = self.time_cum = 0.0
+        self.prev_before: Tuple[float, float] | None = None
+        self.prev_after: Tuple[float, float] | None = None
+        self.last_xy: Tuple[float, float] | None = None   # dernière tâche rendue (travel_m)
+
+    def add(self, work_orders: pd.DataFrame) -> pd.DataFrame:
+        """Réordonne une tranche ; renvoie ses lignes dans l'ordre de passage (travel_m, cumuls)."""
+        wo = work_orders.reset_index(drop=True)
+        x, y = task_coords(wo, self.infra_xy, self.bat_xy)
+
+        keys = pd.DataFrame({
+            "phase": pd.to_numeric(wo["phase"], errors="coerce").fillna(np.inf).to_numpy(),
+            "hosp": -pd.to_numeric(wo["is_hospital"], errors="coerce").fillna(0).to_numpy(),
+            "zone": wo["zone"].astype(str).to_numpy() if "zone" in wo.columns else "",
+        })
+        grouped = keys.sort_values(["phase", "hosp", "zone"], kind="stable")
+        bounds = grouped.ne(grouped.shift()).any(axis=1).to_numpy()
+        group_id = np.cumsum(bounds) - 1
+        base_order = grouped.index.to_numpy()
+
+        new_order: List[np.ndarray] = []
+        for g in range(int(group_id.max()) + 1 if len(wo) else 0):
+            rows = base_order[group_id == g]
+            ok = ~np.isnan(x[rows])
+            pts, lost = rows[ok], rows[~ok]
+            gx, gy = x[pts], y[pts]
+
+            self.before += _path_length(gx, gy, self.prev_before)
+            route = _nn_route(gx, gy, self.prev_after)
+            if len(route) > 3 and time.perf_counter() < self.deadline:
+                route = _two_opt(gx, gy, route, self.prev_after, self.window, self.deadline)
+            self.after += _path_length(gx[route], gy[route], self.prev_after)
+
+            # tâches sans coordonnées : en fin de groupe, ordre d'origine
+            new_order.append(np.concatenate([pts[route], lost]))
+            if len(pts):
+                self.prev_before = (gx[-1], gy[-1])
+                self.prev_after = (gx[route[-1]], gy[route[-1]])
+
+        order = np.concatenate(new_order) if new_order else np.array([], dtype=np.int64)
+        out = wo.iloc[order].reset_index(drop=True)
+        ox, oy = x[order], y[order]
+        if len(out):
+            # 1re tâche : distance depuis la dernière tâche de la tranche précédente
+            px, py = self.last_xy if self.last_xy is not None else (ox[0], oy[0])
+            out["travel_m"] = np.hypot(np.diff(ox, prepend=px), np.diff(oy, prepend=py))
+            if self.last_xy is None:
+                out.loc[0, "travel_m"] = 0.0
+            self.last_xy = (ox[-1], oy[-1])
+        else:
+            out["travel_m"] = []
+
+        # cumuls depuis l'offset (mêmes additions qu'un cumsum sur le tableau complet)
+        out["cost_cum"] = np.cumsum(np.concatenate([[self.cost_cum], out["cost_total"].to_numpy(float)]))[1:]
+        out["time_cum_h"] = np.cumsum(np.concatenate([[self.time_cum], out["time_total_h"].to_numpy(float)]))[1:]
+        out["pct_cum_all"] = out["cost_cum"] / max(self.total_cost, 1e-9)
+        if len(out):
+            self.cost_cum = float(out["cost_cum"].iloc[-1])
+            self.time_cum = float(out["time_cum_h"].iloc[-1])
+
+        self.n_tasks += len(out)
+        self.n_groups += len(new_order)
+        self.n_without_coords += int(np.isnan(x).sum())
+        return out
+
+    def report(self) -> Dict[str, Any]:
+        before, after = self.before, self.after
+        return {
+            "n_tasks": int(self.n_tasks),
+            "n_groups": self.n_groups,
+            "n_without_coords": self.n_without_coords,
+            "travel_m_before": round(before, 1),
+            "travel_m_after": round(after, 1),
+            "travel_m_saved": round(before - after, 1),
+            "saved_pct": round(100.0 * (before - after) / before, 2) if before > 0 else 0.0,
+            "time_s": round(time.perf_counter() - self.t0, 3),
+            "time_limit_hit": time.perf_counter() >= self.deadline,
+        }
+
+
+def sequence_work_orders(work_orders: pd.DataFrame,
+                         infra_xy: pd.DataFrame,
+                         bat_xy: pd.DataFrame,
+                         window: int = DEFAULT_WINDOW,
+                         time_limit_s: float = DEFAULT_TIME_LIMIT_S) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Réordonne les tâches à l'intérieur de chaque groupe (phase, hôpital d'abord, zone si présente)
+    pour réduire les déplacements entre centroïdes de tronçons :
+      plus proche voisin (grille) puis 2-opt fenêtré, sous un budget de temps global.
+    Chaque groupe part du dernier point du groupe précédent. Les frontières de phase
+    et la règle « hôpital d'abord » sont conservées ; cost_cum / time_cum_h / pct_cum_all
+    sont recalculés. Ajoute travel_m (distance depuis la tâche précédente).
+    Tableau complet en une tranche ; WorkOrderSequencer pour un flux de phases.
+    Retourne (work_orders réordonnés, rapport).
+    """
+    seq = WorkOrderSequencer(infra_xy, bat_xy, total_cost=work_orders["cost_total"].sum(),
+                             window=window, time_limit_s=time_limit_s)
+    out = seq.add(work_orders)
+    return out, seq.report()
@@ -1,7 +1,7 @@
 # src/analytics/work_organizer.py
 from __future__ import annotations
 from pathlib import Path
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Iterable, Iterator
 import pandas as pd
 import numpy as np
 import yaml
@@ -15,6 +15,12 @@ def _load_cfg(costs_yaml: str | Path) -> Dict[str, Any]:
         return yaml.safe_load(f)
 
 
+def _plan_rank(plan_df: pd.DataFrame, start: int = 1) -> pd.Series:
+    """Rang de chaque bâtiment dans le plan (1re occurrence), indexé par id_batiment."""
+    ids = plan_df["id_batiment"].drop_duplicates(keep="first")
+    return pd.Series(np.arange(start, start + len(ids)), index=ids.to_numpy())
+
+
 def _collect_hospital_tasks(df_enrich: pd.DataFrame) -> pd.DataFrame:
     """Toutes les tâches (tronçons) à réparer qui alimentent un hôpital."""
     hosp = df_enrich.copy()
@@ -29,15 +35,33 @@ def _collect_hospital_tasks(df_enrich: pd.DataFrame) -> pd.DataFrame:
 def _collect_non_hospital_tasks_in_plan(df_enrich: pd.DataFrame, plan_df: pd.DataFrame) -> pd.DataFrame:
     """Liste des tâches (tronçons) à réparer pour tous les autres bâtiments dans l'ordre du plan glouton."""
     # bâtiments sélectionnés par le plan (hors hôpital)
-    plan_order = plan_df["id_batiment"].tolist()
+    plan_rank = _plan_rank(plan_df, start=0)
     non_hosp = df_enrich[df_enrich["is_hospital"] != 1]
-    non_hosp = non_hosp[non_hosp["a_reparer"] == 1]
+    non_hosp = non_hosp[non_hosp["a_reparer"] == 1].copy()
     # on conserve l'ordre des bâtiments du plan
-    non_hosp["__ord"] = non_hosp["id_batiment"].apply(lambda b: plan_order.index(b) if b in plan_order else 10**9)
+    non_hosp["__ord"] = non_hosp["id_batiment"].map(plan_rank).fillna(10**9)
     non_hosp = non_hosp.sort_values(["__ord", "cost_total", "time_total_h"], ascending=[True, False, False]).drop(columns="__ord")
     return non_hosp.reset_index(drop=True)
 
 
+# seuils : 40%, 60%, 80%, 100% du "reste" (phases 1..4)
+PHASE_CUTS = (0.40, 0.60, 0.80)
+
+# colonnes minimales pour export planning
+WORK_ORDER_COLS = [
+    "id_batiment", "is_hospital", "infra_id", "type_infra", "type_infra_src",
+    "longueur", "man_hours", "time_total_h",
+    "material_cost", "labor_cost", "cost_total",
+    "plan_order"
+]
+
+
+def _phase_bucket(pct: np.ndarray) -> np.ndarray:
+    """Phase 1..4 selon le % de coût cumulé (hors hôpital)."""
+    cut1, cut2, cut3 = PHASE_CUTS
+    return np.where(pct <= cut1, 1, np.where(pct <= cut2, 2, np.where(pct <= cut3, 3, 4)))
+
+
 def _assign_phases_by_cost_cum(df_tasks: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Découpe en phases par paliers de coût cumulé :
@@ -68,20 +92,12 @@ def _assign_phases_by_cost_cum(df_tasks: pd.DataFrame) -> Tuple[pd.DataFrame, pd
         return df, summary
 
     # cumul coût sur le reste
-    rest = rest.sort_values(["plan_order", "cost_total", "time_total_h"], ascending=[True, False, False]).reset_index(drop=True)
+    # (on garde l'index d'origine pour réaffecter les phases aux bonnes lignes)
+    rest = rest.sort_values(["plan_order", "cost_total", "time_total_h"], ascending=[True, False, False])
     rest["cost_cum"] = rest["cost_total"].cumsum()
     rest["pct_cum_rest"] = rest["cost_cum"] / total_cost_rest
 
-    # seuils : 40%, 60%, 80%, 100% du "reste"
-    cut1, cut2, cut3 = 0.40, 0.60, 0.80
-
-    def bucket(p):
-        if p <= cut1: return 1
-        if p <= cut2: return 2
-        if p <= cut3: return 3
-        return 4
-
-    rest["phase"] = rest["pct_cum_rest"].apply(bucket)
+    rest["phase"] = _phase_bucket(rest["pct_cum_rest"].to_numpy())
 
     # réassemble
     keep_cols = ["phase"]
@@ -104,10 +120,82 @@ def _assign_phases_by_cost_cum(df_tasks: pd.DataFrame) -> Tuple[pd.DataFrame, pd
     return df, summary
 
 
+def _select_cols(tasks: pd.DataFrame) -> pd.DataFrame:
+    tasks = tasks.copy()
+    for c in WORK_ORDER_COLS:
+        if c not in tasks.columns:
+            tasks[c] = np.nan
+    return tasks[WORK_ORDER_COLS]
+
+
+def _tasks_in_plan_order(df_enrich: pd.DataFrame, plan_df: pd.DataFrame) -> pd.DataFrame:
+    """Tâches (bâtiment, tronçon) à réparer : hôpital (plan_order=0) puis ordre du plan glouton."""
+    # 1) tâches hôpital
+    hosp_tasks = _collect_hospital_tasks(df_enrich)
+    hosp_tasks = hosp_tasks.assign(plan_order=0)  # toujours en tête
+
+    # 2) tâches non-hôpital dans l'ordre du plan
+    non_hosp_tasks = _collect_non_hospital_tasks_in_plan(df_enrich, plan_df)
+    # L'ordre de plan : rang du bâtiment
+    non_hosp_tasks["plan_order"] = non_hosp_tasks["id_batiment"].map(_plan_rank(plan_df)).fillna(10**9).astype(int)
+
+    # 3) concat
+    return pd.concat([hosp_tasks, non_hosp_tasks], ignore_index=True, sort=False)
+
+
+def _dedupe_by_infra(tasks: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mode normalisé : une tâche par infra_id, placée à la 1re étape du plan qui en a besoin
+    (plan_order min, l'hôpital passant en tête). Un tronçon mutualisé n'est donc compté
+    qu'une fois dans cost_cum, les phases et le contrôle hôpital.
+    """
+    first = tasks.sort_values("plan_order", kind="stable").drop_duplicates("infra_id", keep="first")
+    return first.sort_index()
+
+
+def build_fanout(df_enrich: pd.DataFrame, plan_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Table bâtiment ↔ tâche du mode normalisé : une ligne par (id_batiment, infra_id) à réparer,
+    avec le rang du bâtiment dans le plan. Jointure sur infra_id avec work_orders pour la phase.
+    """
+    return _fanout_pairs(_tasks_in_plan_order(df_enrich, plan_df))
+
+
+def _fanout_pairs(tasks: pd.DataFrame) -> pd.DataFrame:
+    return (tasks[["id_batiment", "infra_id", "is_hospital", "plan_order"]]
+              .drop_duplicates(["id_batiment", "infra_id"])
+              .sort_values(["plan_order", "id_batiment", "infra_id"], kind="stable")
+              .reset_index(drop=True))
+
+
+def iter_phases(batches: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Regroupe des lots de work orders (phases croissantes, ex. WorkOrderStream) en une
+    DataFrame par phase complète, rendue dès que la phase suivante apparaît :
+    zonage et séquencement travaillent phase par phase sans attendre la fin du flux.
+    """
+    parts: List[pd.DataFrame] = []
+    current = None
+    for wo in batches:
+        phase = wo["phase"].to_numpy(float)
+        cuts = np.flatnonzero(phase[1:] != phase[:-1]) + 1
+        for start, end in zip(np.concatenate([[0], cuts]), np.concatenate([cuts, [len(wo)]])):
+            if start == end:
+                continue
+            if parts and phase[start] != current:
+                yield pd.concat(parts) if len(parts) > 1 else parts[0]
+                parts = []
+            current = phase[start]
+            parts.append(wo.iloc[start:end])
+    if parts:
+        yield pd.concat(parts) if len(parts) > 1 else parts[0]
+
+
 def build_work_orders(
     df_enrich: pd.DataFrame,
     plan_df: pd.DataFrame,
     costs_yaml: str | Path,
+    normalized: bool = False,
 ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
     """
     Construit un tableau d'ordres de travaux par tronçon (infra) :
@@ -115,6 +203,8 @@ def build_work_orders(
       - Puis les autres dans l'ordre du plan glouton
       - Découpage en phases coût (40 / 20 / 20 / 20)
       - Ajoute cumul coût/temps
+    normalized : une tâche par infra_id au lieu d'une par (bâtiment, infra)
+                 (work_orders.normalized de project.yaml ; fan-out via build_fanout)
     Retourne (work_orders, phases_summary, meta)
     """
     cfg = _load_cfg(costs_yaml)
@@ -122,31 +212,13 @@ def build_work_orders(
     margin = float(cfg["hospital"]["time_margin"])
     hosp_goal = gen_h * (1.0 - margin)  # ex: 20h * (1-0.2)=16h
 
-    # 1) tâches hôpital
-    hosp_tasks = _collect_hospital_tasks(df_enrich)
-    hosp_tasks = hosp_tasks.assign(plan_order=0)  # toujours en tête
-
-    # 2) tâches non-hôpital dans l'ordre du plan
-    non_hosp_tasks = _collect_non_hospital_tasks_in_plan(df_enrich, plan_df)
-    # L'ordre de plan : rang du bâtiment
-    order_map = {bid: i for i, bid in enumerate(plan_df["id_batiment"].tolist(), start=1)}
-    non_hosp_tasks["plan_order"] = non_hosp_tasks["id_batiment"].map(order_map).fillna(10**9).astype(int)
-
-    # 3) concat
-    tasks = pd.concat([hosp_tasks, non_hosp_tasks], ignore_index=True, sort=False)
+    # 1-3) tâches hôpital puis plan glouton
+    tasks = _tasks_in_plan_order(df_enrich, plan_df)
+    if normalized:
+        tasks = _dedupe_by_infra(tasks)
 
     # 4) colonnes minimales pour export planning
-    cols = [
-        "id_batiment", "is_hospital", "infra_id", "type_infra",
-        "longueur", "man_hours", "time_total_h",
-        "material_cost", "labor_cost", "cost_total",
-        "plan_order"
-    ]
-    for c in cols:
-        if c not in tasks.columns:
-            tasks[c] = np.nan
-
-    tasks = tasks[cols].copy()
+    tasks = _select_cols(tasks)
 
     # 5) assignation de phases + cumuls
     work_orders, phases_summary = _assign_phases_by_cost_cum(tasks)
@@ -159,5 +231,136 @@ def build_work_orders(
         "hospital_time_needed_h": float(hosp_time_needed),
         "hospital_time_goal_h": float(hosp_goal),
         "hospital_margin_ok": bool(hospital_ok),
+        "normalized": bool(normalized),
     }
     return work_orders, phases_summary, meta
+
+
+class WorkOrderStream:
+    """
+    Ordres de travaux construits au fil d'un flux de lots du plan (iter_greedy_plan) :
+    mêmes lignes, colonnes et phases que build_work_orders, sans attendre la fin du plan.
+    Le dénominateur des paliers (coût total hors hôpital) est connu avant la planification
+    (en mode normalisé : coût d'un tronçon identique pour tous ses bâtiments).
+
+        stream = WorkOrderStream(df_enrich, plan_batches, costs_yaml)
+        for wo in stream: ...          # lots dans l'ordre d'exécution (hôpital d'abord)
+        stream.phases_summary()        # après épuisement du flux
+        stream.fanout()                # idem : table bâtiment ↔ tâche (cf. build_fanout)
+    """
+
+    def __init__(self, df_enrich: pd.DataFrame, plan_batches: Iterable[pd.DataFrame],
+                 costs_yaml: str | Path, normalized: bool = False):
+        cfg = _load_cfg(costs_yaml)
+        gen_h = float(cfg["hospital"]["generator_hours"])
+        hosp_goal = gen_h * (1.0 - float(cfg["hospital"]["time_margin"]))
+        self.normalized = normalized
+        self._plan_batches = plan_batches
+
+        # hôpital (phase 0) + reste trié coût/temps décroissants : ordre intra-bâtiment du plan
+        hosp = _collect_hospital_tasks(df_enrich).assign(plan_order=0)
+        rest = _collect_non_hospital_tasks_in_plan(df_enrich, pd.DataFrame({"id_batiment": []}))
+        # paires bâtiment × tronçon avant dédoublonnage (rang du plan complété en fin de flux)
+        self._pairs = pd.concat([hosp[["id_batiment", "infra_id", "is_hospital", "plan_order"]],
+                                 rest[["id_batiment", "infra_id", "is_hospital"]]], ignore_index=True)
+        if normalized:
+            hosp = hosp.drop_duplicates("infra_id", keep="first")
+            rest = rest[~rest["infra_id"].isin(hosp["infra_id"])]
+        self._hosp = hosp.reset_index(drop=True)
+        self._rest = rest.reset_index(drop=True)
+        self._rows_by_bat = self._rest.groupby("id_batiment", sort=False).indices
+
+        rest_unique = self._rest.drop_duplicates("infra_id") if normalized else self._rest
+        self.total_cost_rest = float(rest_unique["cost_total"].sum())
+        self.total_cost_all = float(self._hosp["cost_total"].sum()) + self.total_cost_rest
+
+        hosp_time_needed = float(self._hosp["time_total_h"].sum())
+        self.meta = {
+            "hospital_time_needed_h": hosp_time_needed,
+            "hospital_time_goal_h": float(hosp_goal),
+            "hospital_margin_ok": bool(hosp_time_needed <= hosp_goal + 1e-9),
+            "normalized": bool(normalized),
+        }
+        self._by_phase: Dict[int, List[float]] = {}
+        self._rank: Dict[str, int] = {}
+
+    def _emit(self, sub: pd.DataFrame, phase: np.ndarray) -> pd.DataFrame:
+        wo = _select_cols(sub)
+        wo.insert(len(wo.columns), "phase", phase.astype(float))
+        wo.index = pd.RangeIndex(self._n, self._n + len(wo))
+        self._n += len(wo)
+        if self.total_cost_rest > 0:
+            # cumuls séquentiels depuis l'offset (mêmes additions qu'un cumsum global)
+            wo["cost_cum"] = np.cumsum(np.concatenate([[self._cost_cum], wo["cost_total"].to_numpy(float)]))[1:]
+            wo["time_cum_h"] = np.cumsum(np.concatenate([[self._time_cum], wo["time_total_h"].to_numpy(float)]))[1:]
+            wo["pct_cum_all"] = wo["cost_cum"] / max(self.total_cost_all, 1e-9)
+            self._cost_cum = float(wo["cost_cum"].iloc[-1])
+            self._time_cum = float(wo["time_cum_h"].iloc[-1])
+        for ph, g in wo.groupby("phase", sort=False):
+            acc = self._by_phase.setdefault(ph, [0.0, 0.0])
+            acc[0] += float(g["cost_total"].sum())
+            acc[1] += float(g["time_total_h"].sum())
+        return wo
+
+    def _rest_rows(self, positions: np.ndarray, plan_order: np.ndarray) -> pd.DataFrame | None:
+        if not len(positions):
+            return None
+        sub = self._rest.iloc[positions].assign(plan_order=plan_order)
+        if self.normalized:
+            keep = ~sub["infra_id"].isin(self._seen) & ~sub["infra_id"].duplicated()
+            sub = sub[keep.to_numpy()]
+            self._seen.update(sub["infra_id"])
+        if sub.empty:
+            return None
+        if self.total_cost_rest <= 0:
+            return self._emit(sub, np.zeros(len(sub)))
+        cc = np.cumsum(np.concatenate([[self._rest_cum], sub["cost_total"].to_numpy(float)]))[1:]
+        self._rest_cum = float(cc[-1])
+        return self._emit(sub, _phase_bucket(cc / self.total_cost_rest))
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        self._n, self._cost_cum, self._time_cum, self._rest_cum = 0, 0.0, 0.0, 0.0
+        self._seen = set(self._hosp["infra_id"]) if self.normalized else set()
+        self._by_phase = {}
+
+        # 1) hôpital d'abord (phase 0)
+        if not self._hosp.empty:
+            yield self._emit(self._hosp, np.zeros(len(self._hosp)))
+
+        # 2) bâtiments dans l'ordre du plan, lot par lot
+        rank: Dict[str, int] = {}
+        self._rank = rank
+        for batch in self._plan_batches:
+            pos, order = [], []
+            for bid in batch["id_batiment"].tolist():
+                if bid in rank:
+                    continue
+                rank[bid] = len(rank) + 1
+                idx = self._rows_by_bat.get(bid)
+                if idx is not None:
+                    pos.append(idx)
+                    order.append(np.full(len(idx), rank[bid]))
+            if pos:
+                wo = self._rest_rows(np.concatenate(pos), np.concatenate(order))
+                if wo is not None:
+                    yield wo
+
+        # 3) tâches de bâtiments absents du plan (plan_order = 10**9), ordre coût décroissant
+        left = ~self._rest["id_batiment"].isin(list(rank)).to_numpy()
+        positions = np.flatnonzero(left)
+        wo = self._rest_rows(positions, np.full(len(positions), 10**9))
+        if wo is not None:
+            yield wo
+
+    def fanout(self) -> pd.DataFrame:
+        """Table bâtiment ↔ tâche, identique à build_fanout (disponible une fois le flux consommé)."""
+        pairs = self._pairs.copy()
+        rest = pairs["plan_order"].isna().to_numpy()
+        pairs.loc[rest, "plan_order"] = pairs.loc[rest, "id_batiment"].map(self._rank).fillna(10**9)
+        return _fanout_pairs(pairs.astype({"plan_order": int}))
+
+    def phases_summary(self) -> pd.DataFrame:
+        """Synthèse par phase (disponible une fois le flux consommé)."""
+        rows = [{"phase": ph, "cost_phase": c, "time_phase_h": t}
+                for ph, (c, t) in sorted(self._by_phase.items())]
+        return pd.DataFrame(rows, columns=["phase", "cost_phase", "time_phase_h"])
@@ -0,0 +1,180 @@
+# src/analytics/zoning.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+from src.ingestion.cleaner import _coalesce, COLS_BATS, COLS_INFRA
+
+# taille de maille par défaut (m, CRS métrique) et charge cible d'une zone (h)
+DEFAULT_CELL_M = 25.0
+DEFAULT_ZONE_HOURS = 80.0
+
+
+# ------------------------
+# Coordonnées (shapefiles)
+# ------------------------
+
+def _read_shp(path: str | Path):
+    try:
+        import geopandas as gpd  # dépendance optionnelle (zonage uniquement)
+    except ImportError as e:
+        raise ImportError("Le zonage spatial nécessite geopandas (pip install geopandas).") from e
+    return gpd.read_file(path)
+
+
+def load_points(infra_shp: str | Path | None,
+                bat_shp: str | Path | None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Coordonnées des tâches :
+      - infra_xy : centroïde de chaque tronçon (infra_id, x, y)
+      - bat_xy   : position de chaque bâtiment (id_batiment, x, y), repli si le tronçon est absent
+    """
+    def _xy(gdf, key: str, mapping: dict) -> pd.DataFrame:
+        c = gdf.geometry.centroid
+        df = _coalesce(pd.DataFrame(gdf.drop(columns="geometry")), mapping)
+        out = pd.DataFrame({key: df[key].astype(str).to_numpy(), "x": c.x.to_numpy(), "y": c.y.to_numpy()})
+        # un tronçon découpé en plusieurs géométries => barycentre des morceaux
+        return out.groupby(key, sort=False, as_index=False)[["x", "y"]].mean()
+
+    empty = lambda k: pd.DataFrame(columns=[k, "x", "y"])
+    infra_xy = _xy(_read_shp(infra_shp), "infra_id", COLS_INFRA) if infra_shp else empty("infra_id")
+    bat_xy = _xy(_read_shp(bat_shp), "id_batiment", COLS_BATS) if bat_shp else empty("id_batiment")
+    return infra_xy, bat_xy
+
+
+def task_coords(work_orders: pd.DataFrame,
+                infra_xy: pd.DataFrame,
+                bat_xy: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """x, y de chaque ligne de work_orders (tronçon, sinon bâtiment, sinon NaN)."""
+    def _lookup(keys: pd.Series, table: pd.DataFrame, key: str) -> np.ndarray:
+        idx = pd.Index(table[key].astype(str)).get_indexer(keys.astype(str))
+        xy = table[["x", "y"]].to_numpy(float)
+        out = np.full((len(keys), 2), np.nan)
+        out[idx >= 0] = xy[idx[idx >= 0]]
+        return out
+
+    xy = _lookup(work_orders["infra_id"], infra_xy, "infra_id")
+    miss = np.isnan(xy[:, 0])
+    if miss.any() and "id_batiment" in work_orders.columns:
+        xy[miss] = _lookup(work_orders.loc[miss, "id_batiment"], bat_xy, "id_batiment")
+    return xy[:, 0], xy[:, 1]
+
+
+# ------------------------
+# Grille + courbe de Hilbert
+# ------------------------
+
+def _hilbert_index(ix: np.ndarray, iy: np.ndarray, bits: int) -> np.ndarray:
+    """Indice de Hilbert (vectorisé) des mailles (ix, iy) d'une grille 2^bits x 2^bits."""
+    x = ix.astype(np.int64).copy()
+    y = iy.astype(np.int64).copy()
+    n = np.int64(1) << bits
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        d += s * s * ((3 * rx) ^ ry)
+        # rotation du quadrant
+        flip = (ry == 0) & (rx == 1)
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ry == 0
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+
+def spatial_order(x: np.ndarray, y: np.ndarray, cell_m: float = DEFAULT_CELL_M) -> np.ndarray:
+    """
+    Ordre de parcours spatial : hachage des points sur une grille de maille cell_m,
+    puis tri des mailles le long d'une courbe de Hilbert (O(n log n), sans matrice de distances).
+    Les points sans coordonnées sont placés en fin.
+    """
+    ok = ~(np.isnan(x) | np.isnan(y))
+    key = np.full(len(x), np.iinfo(np.int64).max, dtype=np.int64)
+    if ok.any():
+        ix = np.floor((x[ok] - x[ok].min()) / cell_m).astype(np.int64)
+        iy = np.floor((y[ok] - y[ok].min()) / cell_m).astype(np.int64)
+        bits = max(1, int(max(ix.max(), iy.max())).bit_length())
+        key[ok] = _hilbert_index(ix, iy, bits)
+    return np.argsort(key, kind="stable")
+
+
+def _balanced_cuts(weights: np.ndarray, n_zones: int) -> np.ndarray:
+    """Découpe une séquence ordonnée en n_zones tranches contiguës de poids ~égal."""
+    if n_zones <= 1 or len(weights) == 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    cum = np.cumsum(weights)
+    mid = cum - weights / 2.0                     # une tâche va à la tranche qui contient son milieu
+    z = np.floor(mid / (cum[-1] / n_zones)).astype(np.int64)
+    return np.clip(z, 0, n_zones - 1)
+
+
+# ------------------------
+# Zonage des work orders
+# ------------------------
+
+def assign_zones(work_orders: pd.DataFrame,
+                 infra_xy: pd.DataFrame,
+                 bat_xy: pd.DataFrame,
+                 zone_hours: float = DEFAULT_ZONE_HOURS,
+                 cell_m: float = DEFAULT_CELL_M) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Regroupe les tâches de chaque phase en zones d'équipe compactes et équilibrées en heures :
+      - nb de zones de la phase = ceil(heures de la phase / zone_hours)
+      - tâches ordonnées le long de la courbe de Hilbert (spatial_order)
+      - découpe en tranches contiguës d'heures (time_total_h) ~égales
+    L'ordre des lignes est conservé ; ajoute la colonne `zone` ("P<phase>-Z<k>", k complété par
+    des zéros selon le nb de zones de la phase : P1-Z007 ... P1-Z100 se trient dans l'ordre).
+    Retourne (work_orders avec zone, synthèse par zone).
+    """
+    wo = work_orders.copy()
+    x, y = task_coords(wo, infra_xy, bat_xy)
+    hours = pd.to_numeric(wo["time_total_h"], errors="coerce").fillna(0.0).to_numpy(float)
+    phase = pd.to_numeric(wo["phase"], errors="coerce").fillna(-1).astype(int).to_numpy()
+
+    zone = np.empty(len(wo), dtype=object)
+    for ph in np.unique(phase):
+        rows = np.flatnonzero(phase == ph)
+        n_zones = max(1, int(np.ceil(hours[rows].sum() / max(zone_hours, 1e-9))))
+        n_zones = min(n_zones, len(rows))
+        order = rows[spatial_order(x[rows], y[rows], cell_m)]
+        k = _balanced_cuts(hours[order], n_zones)
+        width = max(2, len(str(n_zones - 1)))   # libellés de même longueur => tri texte = tri numérique
+        zone[order] = [f"P{ph}-Z{z:0{width}d}" for z in k]
+    wo["zone"] = zone
+
+    return wo, zones_summary(wo, x, y)
+
+
+def zones_summary(wo: pd.DataFrame, x: np.ndarray, y: np.ndarray) -> pd.DataFrame:
+    """Synthèse par zone : charge, coût, étendue (centre, rayon moyen/max autour du centre)."""
+    t = pd.DataFrame({
+        "zone": wo["zone"].to_numpy(),
+        "phase": pd.to_numeric(wo["phase"], errors="coerce").to_numpy(),
+        "infra_id": wo["infra_id"].astype(str).to_numpy(),
+        "id_batiment": wo["id_batiment"].astype(str).to_numpy(),
+        "time_total_h": pd.to_numeric(wo["time_total_h"], errors="coerce").fillna(0.0).to_numpy(),
+        "cost_total": pd.to_numeric(wo["cost_total"], errors="coerce").fillna(0.0).to_numpy(),
+        "longueur": pd.to_numeric(wo["longueur"], errors="coerce").fillna(0.0).to_numpy(),
+        "x": x, "y": y,
+    })
+    g = t.groupby("zone", sort=True)
+    summ = g.agg(
+        phase=("phase", "first"),
+        n_tasks=("infra_id", "size"),
+        n_infras=("infra_id", "nunique"),
+        n_buildings=("id_batiment", "nunique"),
+        time_total_h=("time_total_h", "sum"),
+        cost_total=("cost_total", "sum"),
+        longueur=("longueur", "sum"),
+        x_center=("x", "mean"),
+        y_center=("y", "mean"),
+    )
+    d = np.hypot(t["x"] - t["zone"].map(summ["x_center"]), t["y"] - t["zone"].map(summ["y_center"]))
+    summ["radius_mean_m"] = d.groupby(t["zone"]).mean()
+    summ["radius_max_m"] = d.groupby(t["zone"]).max()
+    return summ.reset_index().sort_values(["phase", "zone"], kind="stable").reset_index(drop=True)
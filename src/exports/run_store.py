@@ -0,0 +1,279 @@
+# src/exports/run_store.py
+from __future__ import annotations
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+import json
+import sqlite3
+import pandas as pd
+
+# Colonnes conservées par table (les colonnes absentes du DataFrame sont stockées à NULL)
+PLAN_COLS = ["step", "id_batiment", "type_batiment", "nb_houses",
+             "building_difficulty_before", "repaired_infras"]
+WORK_ORDER_COLS = ["id_batiment", "infra_id", "is_hospital", "type_infra", "plan_order", "phase",
+                   "zone", "longueur", "time_total_h", "cost_total", "cost_cum", "time_cum_h", "travel_m"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at   TEXT NOT NULL,
+    finished_at  TEXT,
+    status       TEXT NOT NULL DEFAULT 'running',
+    normalized   INTEGER NOT NULL DEFAULT 0,
+    params_json  TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_runs_started ON runs(started_at);
+
+CREATE TABLE IF NOT EXISTS plans (
+    run_id  INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    seq     INTEGER NOT NULL,
+    step INTEGER, id_batiment TEXT, type_batiment TEXT, nb_houses REAL,
+    building_difficulty_before REAL, repaired_infras TEXT,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_plans_bat ON plans(id_batiment, run_id);
+
+CREATE TABLE IF NOT EXISTS work_orders (
+    run_id  INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    seq     INTEGER NOT NULL,
+    id_batiment TEXT, infra_id TEXT, is_hospital INTEGER, type_infra TEXT, plan_order INTEGER,
+    phase REAL, zone TEXT, longueur REAL, time_total_h REAL, cost_total REAL,
+    cost_cum REAL, time_cum_h REAL, travel_m REAL,
+    PRIMARY KEY (run_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_wo_bat   ON work_orders(id_batiment, run_id);
+CREATE INDEX IF NOT EXISTS ix_wo_infra ON work_orders(infra_id, run_id);
+CREATE INDEX IF NOT EXISTS ix_wo_phase ON work_orders(run_id, phase);
+
+CREATE TABLE IF NOT EXISTS fanout (
+    run_id  INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    id_batiment TEXT NOT NULL, infra_id TEXT NOT NULL,
+    PRIMARY KEY (run_id, id_batiment, infra_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_fanout_bat ON fanout(id_batiment, run_id);
+
+CREATE TABLE IF NOT EXISTS kpis (
+    run_id     INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    source     TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      REAL,
+    value_json TEXT,
+    PRIMARY KEY (run_id, source, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_kpis_key ON kpis(source, key, run_id);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _flatten(obj: Any, prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    """{"a": {"b": 1}, "l": [{"c": 2}]} -> ("a.b", 1), ("l.0.c", 2)"""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}{k}.")
+    elif isinstance(obj, (list, tuple)) and obj:
+        for i, v in enumerate(obj):
+            yield from _flatten(v, f"{prefix}{i}.")
+    else:
+        yield prefix[:-1], obj
+
+
+def _rows(df: pd.DataFrame, cols: List[str], run_id: int, start: int = 0) -> Iterator[tuple]:
+    """Tuples (run_id, seq, *cols) en types Python natifs (NaN -> NULL), sans copie du DataFrame entier."""
+    present = [c for c in cols if c in df.columns]
+    sub = df[present].astype(object).where(df[present].notna(), None)
+    for c in cols:
+        if c not in sub.columns:
+            sub[c] = None
+    for seq, row in enumerate(sub[cols].itertuples(index=False, name=None), start=start):
+        yield (run_id, seq, *[json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (list, dict)) else v
+                              for v in row])
+
+
+class RunStore:
+    """
+    Historique des exécutions dans une base SQLite (un seul fichier) :
+      - runs        : une ligne par exécution (paramètres, statut, horodatage)
+      - plans       : plan glouton de chaque run
+      - work_orders : ordres de travaux de chaque run
+      - fanout      : bâtiment ↔ tronçon de chaque run (une tâche normalisée sert plusieurs bâtiments)
+      - kpis        : indicateurs aplatis (source, clé) -> valeur
+    Index sur bâtiment / infra / phase ; la purge supprime les runs en cascade.
+    """
+    def __init__(self, db_path: str | Path):
+        self.path = Path(db_path); self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(_SCHEMA)
+        # bases créées avant la colonne runs.normalized : reprise depuis les paramètres du run
+        if "normalized" not in {r[1] for r in self.conn.execute("PRAGMA table_info(runs)")}:
+            with self.conn:
+                self.conn.execute("ALTER TABLE runs ADD COLUMN normalized INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute("""UPDATE runs SET normalized = 1
+                                     WHERE json_extract(params_json, '$.project.work_orders.normalized') = 1""")
+
+    # ------------------------------
+    # Écriture
+    # ------------------------------
+    def start_run(self, params: Dict[str, Any] | None = None, normalized: bool = False) -> int:
+        """normalized : work_orders à une tâche par infra_id (bâtiments servis via la table fanout)."""
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO runs(started_at, normalized, params_json) VALUES (?, ?, ?)",
+                                    (_now(), int(bool(normalized)),
+                                     json.dumps(params or {}, ensure_ascii=False, default=str)))
+        return int(cur.lastrowid)
+
+    def finish_run(self, run_id: int, status: str = "ok") -> None:
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ?, status = ? WHERE run_id = ?",
+                              (_now(), status, run_id))
+
+    def add_plan(self, run_id: int, plan_df: pd.DataFrame) -> int:
+        return self._bulk("plans", PLAN_COLS, run_id, plan_df)
+
+    def add_work_orders(self, run_id: int, work_orders: pd.DataFrame) -> int:
+        return self._bulk("work_orders", WORK_ORDER_COLS, run_id, work_orders)
+
+    def append_plan(self, run_id: int, plan_batch: pd.DataFrame) -> int:
+        """Lot suivant du plan (streaming) : seq continue après les lignes déjà enregistrées."""
+        return self._bulk("plans", PLAN_COLS, run_id, plan_batch, append=True)
+
+    def append_work_orders(self, run_id: int, work_orders: pd.DataFrame) -> int:
+        """Lot suivant des work orders (streaming, ex. une phase) ; seq continue."""
+        return self._bulk("work_orders", WORK_ORDER_COLS, run_id, work_orders, append=True)
+
+    def add_fanout(self, run_id: int, fanout: pd.DataFrame) -> int:
+        """Paires (id_batiment, infra_id) : table fan-out, ou work_orders en mode non normalisé."""
+        pairs = fanout[["id_batiment", "infra_id"]].astype(str).drop_duplicates()
+        with self.conn:
+            self.conn.execute("DELETE FROM fanout WHERE run_id = ?", (run_id,))
+            self.conn.executemany("INSERT INTO fanout VALUES (?, ?, ?)",
+                                  ((run_id, b, i) for b, i in pairs.itertuples(index=False, name=None)))
+        return len(pairs)
+
+    def add_kpis(self, run_id: int, source: str, kpis: Dict[str, Any]) -> int:
+        rows = []
+        for key, v in _flatten(kpis):
+            num = isinstance(v, (int, float)) and not isinstance(v, bool)
+            rows.append((run_id, source, key, float(v) if num else None,
+                         None if num else json.dumps(v, ensure_ascii=False, default=str)))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO kpis VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _bulk(self, table: str, cols: List[str], run_id: int, df: pd.DataFrame, append: bool = False) -> int:
+        """
+        Insertion en masse (executemany, une transaction) ; remplace les lignes du run si déjà
+        présentes, ou les complète (append : seq à la suite).
+        """
+        sql = f"INSERT INTO {table}(run_id, seq, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 2))})"
+        with self.conn:
+            start = 0
+            if append:
+                start = self.conn.execute(f"SELECT COALESCE(MAX(seq) + 1, 0) FROM {table} WHERE run_id = ?",
+                                          (run_id,)).fetchone()[0]
+            else:
+                self.conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+            self.conn.executemany(sql, _rows(df, cols, run_id, start))
+        return len(df)
+
+    # ------------------------------
+    # Lecture
+    # ------------------------------
+    def _query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def latest_run_id(self, status: str | None = "ok") -> int | None:
+        sql = "SELECT MAX(run_id) FROM runs" + (" WHERE status = ?" if status else "")
+        row = self.conn.execute(sql, (status,) if status else ()).fetchone()
+        return None if row[0] is None else int(row[0])
+
+    def runs(self, limit: int = 20) -> pd.DataFrame:
+        return self._query("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+
+    def plan(self, run_id: int | None = None) -> pd.DataFrame:
+        run_id = self.latest_run_id() if run_id is None else run_id
+        return self._query("SELECT * FROM plans WHERE run_id = ? ORDER BY seq", (run_id,))
+
+    def work_orders(self, run_id: int | None = None, phase: float | None = None) -> pd.DataFrame:
+        run_id = self.latest_run_id() if run_id is None else run_id
+        if phase is None:
+            return self._query("SELECT * FROM work_orders WHERE run_id = ? ORDER BY seq", (run_id,))
+        return self._query("SELECT * FROM work_orders WHERE run_id = ? AND phase = ? ORDER BY seq",
+                           (run_id, phase))
+
+    def building_history(self, id_batiment: str, limit: int = 20) -> pd.DataFrame:
+        """
+        Étape du plan et tâches d'un bâtiment, sur les derniers runs. Les tâches passent par
+        la table fanout : en mode normalisé, work_orders.id_batiment ne porte que le 1er
+        bâtiment servi par chaque tronçon (jointure par infra_id seul) ; sinon, seules les
+        lignes du bâtiment lui-même comptent (un tronçon partagé a aussi les tâches des autres).
+        """
+        return self._query(
+            """WITH t AS (
+                   SELECT f.run_id, f.infra_id, MIN(w.phase) AS phase, MAX(w.cost_total) AS cost_total
+                   FROM fanout f
+                   JOIN runs r ON r.run_id = f.run_id
+                   JOIN work_orders w ON w.run_id = f.run_id AND w.infra_id = f.infra_id
+                                     AND (r.normalized = 1 OR w.id_batiment = f.id_batiment)
+                   WHERE f.id_batiment = ?
+                   GROUP BY f.run_id, f.infra_id)
+               SELECT r.run_id, r.started_at, p.step, p.building_difficulty_before,
+                      COUNT(t.infra_id) AS n_tasks, MIN(t.phase) AS phase, SUM(t.cost_total) AS cost_total
+               FROM plans p JOIN runs r ON r.run_id = p.run_id
+               LEFT JOIN t ON t.run_id = p.run_id
+               WHERE p.id_batiment = ?
+               GROUP BY r.run_id, p.seq
+               ORDER BY r.run_id DESC LIMIT ?""", (str(id_batiment), str(id_batiment), limit))
+
+    def infra_history(self, infra_id: str, limit: int = 20) -> pd.DataFrame:
+        """Phase / zone / rang d'un tronçon dans les ordres de travaux des derniers runs."""
+        return self._query(
+            """SELECT r.run_id, r.started_at, w.seq, w.id_batiment, w.phase, w.zone, w.plan_order, w.cost_total
+               FROM work_orders w JOIN runs r ON r.run_id = w.run_id
+               WHERE w.infra_id = ?
+               ORDER BY r.run_id DESC, w.seq LIMIT ?""", (str(infra_id), limit))
+
+    def kpi_history(self, key: str, source: str = "kpi_baseline", since: str | None = None) -> pd.DataFrame:
+        """Évolution d'un indicateur (clé aplatie, ex. "cout_total") au fil des runs."""
+        return self._query(
+            """SELECT r.run_id, r.started_at, k.value, k.value_json
+               FROM kpis k JOIN runs r ON r.run_id = k.run_id
+               WHERE k.source = ? AND k.key = ? AND r.started_at >= ?
+               ORDER BY r.run_id""", (source, key, since or ""))
+
+    # ------------------------------
+    # Rétention
+    # ------------------------------
+    def prune(self, keep_last: int | None = None, older_than_days: float | None = None) -> int:
+        """
+        Supprime les runs (et leurs lignes, en cascade) au-delà des keep_last plus récents
+        et/ou démarrés il y a plus de older_than_days jours. Renvoie le nb de runs supprimés.
+        """
+        clauses, params = [], []
+        if keep_last is not None:
+            clauses.append("run_id NOT IN (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?)")
+            params.append(int(keep_last))
+        if older_than_days is not None:
+            clauses.append("started_at < ?")
+            params.append((datetime.now() - timedelta(days=older_than_days)).isoformat(timespec="seconds"))
+        if not clauses:
+            return 0
+        with self.conn:
+            cur = self.conn.execute(f"DELETE FROM runs WHERE {' OR '.join(clauses)}", tuple(params))
+        if cur.rowcount:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return cur.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,7 +1,12 @@
 from pathlib import Path
 import pandas as pd
 import json
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
+
+# base_2025-10-31T22-50-30.ext (save_csv, save_json, CsvStream, timestamped_path)
+_TS_NAME = re.compile(r"^(?P<base>.+)_(?P<ts>\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})\.[^.]+$")
 
 def _ts() -> str:
     return datetime.now().isoformat(timespec="seconds").replace(":","-")
@@ -14,3 +19,60 @@ def save_json(obj: dict, base: str | Path) -> Path:
     p = Path(f"{base}_{_ts()}.json"); p.parent.mkdir(parents=True, exist_ok=True)
     with open(p, "w", encoding="utf-8") as f: json.dump(obj, f, ensure_ascii=False, indent=2)
     return p
+
+class CsvStream:
+    """
+    CSV écrit lot par lot (en-tête au 1er lot, flush à chaque lot) :
+    les premières lignes sont sur disque pendant que les suivantes sont calculées.
+    """
+    def __init__(self, base: str | Path):
+        self.path = Path(f"{base}_{_ts()}.csv"); self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self._f, index=False, header=self._header)
+        self._header = False
+        self._f.flush()
+
+    def tap(self, batches: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Écrit chaque lot au passage et le retransmet (pour chaîner plan -> work orders)."""
+        for df in batches:
+            self.write(df)
+            yield df
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "CsvStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def prune_timestamped(dirs: Iterable[str | Path], keep_last: int | None = None,
+                      older_than_days: float | None = None) -> int:
+    """
+    Rétention des exports horodatés : pour chaque nom de base (et extension) d'un dossier,
+    garde les keep_last plus récents et supprime ceux de plus de older_than_days jours.
+    Renvoie le nb de fichiers supprimés.
+    """
+    if keep_last is None and older_than_days is None:
+        return 0
+    cutoff = None
+    if older_than_days is not None:
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat(timespec="seconds").replace(":", "-")
+    groups: dict[tuple, list] = {}
+    for d in dirs:
+        for p in Path(d).glob("*_*"):
+            m = _TS_NAME.match(p.name)
+            if m and p.is_file():
+                groups.setdefault((p.parent, m["base"], p.suffix), []).append((m["ts"], p))
+    removed = 0
+    for files in groups.values():
+        files.sort(reverse=True)
+        for k, (ts, p) in enumerate(files):
+            if (keep_last is not None and k >= int(keep_last)) or (cutoff is not None and ts < cutoff):
+                p.unlink(missing_ok=True)
+                removed += 1
+    return removed
@@ -58,21 +58,23 @@ def clean_and_join(
     df_reseau: pd.DataFrame,
     df_bat: pd.DataFrame | None,
     df_infra: pd.DataFrame | None,
+    coalesced: bool = False,
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Normalise schémas + jointure:
     - df (réseau enrichi): [infra_id, id_batiment, longueur, type_infra, ...]
     - infra_base (agrégats par infra)
     - bat_base (caractéristiques uniques batiments)
+    coalesced=True : les entrées sont déjà passées par _coalesce (ingestion parallèle).
     """
-    df_reseau = _coalesce(df_reseau, COLS_RESEAU)
+    df_reseau = df_reseau.copy() if coalesced else _coalesce(df_reseau, COLS_RESEAU)
     if df_bat is not None:
-        df_bat = _coalesce(df_bat, COLS_BATS)
+        df_bat = df_bat if coalesced else _coalesce(df_bat, COLS_BATS)
     else:
         df_bat = pd.DataFrame(columns=list(COLS_BATS.keys()))
 
     if df_infra is not None:
-        df_infra = _coalesce(df_infra, COLS_INFRA)
+        df_infra = df_infra.copy() if coalesced else _coalesce(df_infra, COLS_INFRA)
     else:
         df_infra = pd.DataFrame(columns=list(COLS_INFRA.keys()))
 
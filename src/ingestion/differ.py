@@ -0,0 +1,165 @@
+# src/ingestion/differ.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+# clés métier de chaque table d'entrée (colonnes cibles de _coalesce)
+TABLE_KEYS = {
+    "reseau": ["id_batiment", "infra_id"],
+    "bat":    ["id_batiment"],
+    "infra":  ["infra_id"],
+}
+AFFECTED_KEYS = ("id_batiment", "infra_id")
+_HASH_DTYPES = {"key_hash": "uint64", "row_hash": "uint64", "_dup": "int64"}
+_META_COLS = ("_dup", "key_hash", "row_hash")
+
+
+def _norm_str(s: pd.Series) -> pd.Series:
+    """
+    Valeur normalisée pour le hachage, indépendante du dtype lu :
+      - nombres sous une forme canonique (8, 8.0, "8.0", " 8 " -> "8" ; 12.50 -> "12.5")
+      - sinon texte sans espaces superflus ; vide si manquant.
+    Un changement de dtype d'une livraison à l'autre (ex. int -> float après une cellule vide)
+    ne marque donc pas toute la table comme modifiée.
+    """
+    txt = s.astype("string").str.strip()
+    num = pd.to_numeric(txt, errors="coerce").astype("float64")
+    out = txt.fillna("").astype(object)
+    is_num = num.notna() & np.isfinite(num)
+    integral = is_num & (num % 1 == 0) & (num.abs() < 1e15)
+    out[integral] = num[integral].astype("int64").astype(str)
+    frac = is_num & ~integral
+    out[frac] = num[frac].map(repr)
+    return out
+
+
+def row_hashes(df: pd.DataFrame, keys: List[str], columns: List[str]) -> pd.DataFrame:
+    """
+    Empreintes par ligne (après _coalesce) :
+      - key_hash : clé métier + rang d'occurrence (cumcount) pour distinguer les doublons de clé
+      - row_hash : valeurs des colonnes normalisées (ordre des colonnes indifférent)
+    Les valeurs normalisées sont conservées à côté des empreintes (ancien/nouveau des lignes modifiées).
+    Tout est vectorisé (pd.util.hash_pandas_object) => linéaire en nb de lignes.
+    """
+    key_df = pd.DataFrame({k: _norm_str(df[k]) for k in keys})
+    dup = key_df.groupby(keys, sort=False).cumcount().to_numpy()
+    key_h = pd.util.hash_pandas_object(key_df.assign(_dup=dup), index=False).to_numpy()
+    cols = sorted(c for c in columns if c in df.columns)
+    val_df = pd.DataFrame({c: _norm_str(df[c]) for c in cols})
+    row_h = pd.util.hash_pandas_object(val_df, index=False).to_numpy()
+    out = key_df.copy()
+    out["_dup"] = dup
+    out["key_hash"] = key_h
+    out["row_hash"] = row_h
+    for c in cols:
+        if c not in keys:
+            out[c] = val_df[c]
+    return out
+
+
+def _value_cols(hashes: pd.DataFrame, keys: List[str]) -> List[str]:
+    return [c for c in hashes.columns if c not in keys and c not in _META_COLS]
+
+
+def diff_hashes(old: pd.DataFrame, new: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Lignes ajoutées / supprimées / modifiées entre deux jeux d'empreintes (jointure par hachage, O(n)).
+    Renvoie les colonnes clés + _dup + change ; une ligne modifiée est détaillée par colonne
+    changée (column, old_value, new_value), une ligne par cellule.
+    """
+    pos = pd.Index(old["key_hash"]).get_indexer(new["key_hash"])   # key_hash unique (cumcount)
+    added = pos < 0
+    modified = np.zeros(len(new), dtype=bool)
+    hit = ~added
+    modified[hit] = old["row_hash"].to_numpy()[pos[hit]] != new["row_hash"].to_numpy()[hit]
+    removed = ~old["key_hash"].isin(new["key_hash"]).to_numpy()
+
+    cols = keys + ["_dup"]
+    mod_rows = np.flatnonzero(modified)
+    cells = []
+    # colonnes présentes des deux côtés (empreintes d'une ancienne version : ligne sans détail)
+    for c in sorted(set(_value_cols(old, keys)) & set(_value_cols(new, keys))):
+        o = old[c].to_numpy(object)[pos[mod_rows]]
+        n = new[c].to_numpy(object)[mod_rows]
+        d = o != n
+        cells.append(pd.DataFrame({"_row": mod_rows[d], "column": c, "old_value": o[d], "new_value": n[d]}))
+    mods = new.loc[modified, cols].assign(change="modified", _row=mod_rows)
+    if cells:
+        mods = mods.merge(pd.concat(cells, ignore_index=True), on="_row", how="left").sort_values(
+            ["_row", "column"], kind="stable")
+
+    parts = [
+        new.loc[added, cols].assign(change="added"),
+        old.loc[removed, cols].assign(change="removed"),
+        mods.drop(columns="_row"),
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+
+def _hash_path(store_dir: Path, table: str) -> Path:
+    return store_dir / f"{table}.csv"
+
+
+def load_hashes(store_dir: str | Path, table: str) -> pd.DataFrame | None:
+    p = _hash_path(Path(store_dir), table)
+    if not p.exists():
+        return None
+    # valeurs normalisées relues telles quelles (texte, vide si manquant)
+    df = pd.read_csv(p, dtype=str, keep_default_na=False)
+    return df.astype({c: t for c, t in _HASH_DTYPES.items() if c in df.columns})
+
+
+def save_hashes(hashes: pd.DataFrame, store_dir: str | Path, table: str) -> Path:
+    p = _hash_path(Path(store_dir), table); p.parent.mkdir(parents=True, exist_ok=True)
+    hashes.to_csv(p, index=False)
+    return p
+
+
+def diff_inputs(frames: Dict[str, pd.DataFrame | None],
+                mappings: Dict[str, Dict[str, List[str]]],
+                store_dir: str | Path) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any], Dict[str, pd.DataFrame]]:
+    """
+    Compare chaque table (déjà passée par _coalesce) à la livraison précédente
+    (empreintes stockées dans store_dir). Les empreintes stockées ne sont pas modifiées :
+    les nouvelles sont renvoyées, à enregistrer (save_hashes) une fois le run réussi.
+    Retourne ({table: changements}, rapport avec comptes et clés id_batiment / infra_id touchées,
+    {table: nouvelles empreintes}).
+    Première livraison (aucune empreinte) : baseline, pas de changements listés.
+    """
+    changes: Dict[str, pd.DataFrame] = {}
+    hashes: Dict[str, pd.DataFrame] = {}
+    report: Dict[str, Any] = {"tables": {}}
+    affected: Dict[str, set] = {k: set() for k in AFFECTED_KEYS}
+    for table, keys in TABLE_KEYS.items():
+        df = frames.get(table)
+        if df is None:
+            continue
+        new = row_hashes(df, keys, list(mappings[table].keys()))
+        hashes[table] = new
+        old = load_hashes(store_dir, table)
+        if old is None:
+            report["tables"][table] = {"baseline": True, "rows": int(len(new))}
+            continue
+
+        ch = diff_hashes(old, new, keys)
+        changes[table] = ch
+        # une ligne par cellule pour les modifiées => comptes sur les lignes distinctes
+        counts = ch.drop_duplicates(keys + ["_dup", "change"])["change"].value_counts()
+        report["tables"][table] = {
+            "baseline": False,
+            "rows": int(len(new)),
+            **{c: int(counts.get(c, 0)) for c in ("added", "removed", "modified")},
+        }
+        for k in AFFECTED_KEYS:
+            if k in ch.columns:
+                affected[k].update(ch[k].astype(str))
+
+    affected = {k: sorted(v - {""}) for k, v in affected.items()}
+    report["affected"] = {k: {"count": len(v), "keys": v} for k, v in affected.items()}
+    report["unchanged"] = all(
+        t.get("baseline") is False and t["added"] + t["removed"] + t["modified"] == 0
+        for t in report["tables"].values()
+    )
+    return changes, report, hashes
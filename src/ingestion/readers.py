@@ -1,10 +1,304 @@
 # src/ingestion/readers.py
 from pathlib import Path
+from typing import Iterable
+import xml.etree.ElementTree as ET
+import html
+import io
+import re
+import zipfile
+import numpy as np
 import pandas as pd
 import csv
 
 EXCEL_SUFFIXES = {".xlsx", ".xls", ".xlsm", ".xlsb"}
 CSV_SUFFIXES   = {".csv", ".txt"}
+# formats OOXML lisibles en streaming (zip + XML de feuille)
+STREAM_SUFFIXES = {".xlsx", ".xlsm"}
+STREAM_BATCH_ROWS = 50_000
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_ROW_RE = re.compile(r"<(?:\w+:)?row\b[^>]*>(.*?)</(?:\w+:)?row>", re.S)
+_CELL_RE = re.compile(r"<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)", re.S)
+_ATTR_R = re.compile(r'\br="([A-Z]+)(\d+)"')
+_ATTR_T = re.compile(r'\bt="(\w+)"')
+_V_RE = re.compile(r"<(?:\w+:)?v>(.*?)</(?:\w+:)?v>", re.S)
+_INLINE_T_RE = re.compile(r"<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>", re.S)
+# comptage des cellules d'un bloc : toutes / `r` en 1er attribut / `r` à n'importe quelle position
+_ANY_CELL_RE = re.compile(r"<(?:\w+:)?c[\s/>]")
+_R_FIRST_CELL_RE = re.compile(r'<(?:\w+:)?c r="')
+_R_CELL_RE = re.compile(r'<(?:\w+:)?c\b(?=[^>]*?\br=")')
+# dernière ligne non vide d'un bloc (toutes colonnes confondues)
+_ROW_OPEN_RE = re.compile(r"<(?:\w+:)?row\b[^>]*>")
+_ROW_NUM_RE = re.compile(r'\br="(\d+)"')
+_HAS_VALUE_RE = re.compile(r"<(?:\w+:)?[vt](?:\s[^>]*)?>[^<]")
+
+
+def _norm(name) -> str:
+    return ("" if name is None else str(name)).strip().lower()
+
+
+def _typed_batch(s: pd.Series) -> pd.Series:
+    """
+    Typage d'un lot de valeurs de cellules, au plus proche de read_excel :
+    - nombres entiers stockés en float => int
+    - colonnes texte entièrement numériques ("12.31") => numériques
+    """
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.infer_objects()
+    if not pd.api.types.is_numeric_dtype(s) and _looks_numeric(s):
+        num = pd.to_numeric(s, errors="coerce")
+        if num.notna().sum() == s.notna().sum():
+            s = num
+    if pd.api.types.is_float_dtype(s) and s.notna().all() and (s % 1 == 0).all():
+        s = s.astype("int64")
+    return s
+
+
+def _int_cells(s: pd.Series) -> pd.Series:
+    """Colonne object (types mélangés) : flottants entiers => int, cellule par cellule, comme read_excel."""
+    f = s.map(lambda v: isinstance(v, float) and v.is_integer()).to_numpy(bool)
+    if f.any():
+        s = s.copy()
+        s[f] = [int(v) for v in s[f]]
+    return s
+
+
+def _last_data_row(body: str) -> int:
+    """
+    N° de la dernière ligne du bloc portant au moins une valeur, toutes colonnes confondues
+    (y compris celles non conservées) ; 0 si aucune. Parcours depuis la fin : en pratique
+    seule la dernière ligne est examinée.
+    """
+    end = len(body)
+    while end > 0:
+        i = body.rfind("row", 0, end)
+        while i > 0 and not (body[i - 1] in "<:" and body[i + 3:i + 4] in (" ", ">")):
+            i = body.rfind("row", 0, i)
+        lt = body.rfind("<", 0, i) if i > 0 else -1
+        if lt < 0:
+            return 0
+        if body[lt + 1] != "/":
+            m = _ROW_OPEN_RE.match(body, lt)
+            if m is not None and _HAS_VALUE_RE.search(body, m.end(), end):
+                r = _ROW_NUM_RE.search(m.group(0))
+                return int(r.group(1)) if r else 0
+        end = lt
+    return 0
+
+
+def _looks_numeric(s: pd.Series) -> bool:
+    """Test rapide sur la 1re valeur non nulle (évite un to_numeric complet sur les identifiants)."""
+    i = s.first_valid_index()
+    if i is None:
+        return False
+    try:
+        float(s[i])
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _xlsx_sheet_path(z: zipfile.ZipFile, sheet_name: int | str) -> str:
+    """Chemin de la feuille dans l'archive (par index ou par nom), via workbook.xml + rels."""
+    wb = ET.fromstring(z.read("xl/workbook.xml"))
+    sheets = wb.find(f"{_NS}sheets")
+    sheets = [] if sheets is None else list(sheets)
+    if isinstance(sheet_name, int):
+        sheet = sheets[sheet_name]
+    else:
+        sheet = next((sh for sh in sheets if sh.get("name") == sheet_name), None)
+        if sheet is None:
+            raise ValueError(f"Feuille introuvable: {sheet_name}")
+    rid = sheet.get(f"{_REL_NS}id")
+    rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    target = next(r.get("Target") for r in rels if r.get("Id") == rid)
+    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+
+def _xlsx_shared_strings(z: zipfile.ZipFile) -> list[str]:
+    if "xl/sharedStrings.xml" not in z.namelist():
+        return []
+    out: list[str] = []
+    with z.open("xl/sharedStrings.xml") as f:
+        for _, el in ET.iterparse(f):
+            if el.tag == f"{_NS}si":
+                out.append("".join(t.text or "" for t in el.iter(f"{_NS}t")))
+                el.clear()
+    return out
+
+
+def _xlsx_value(t: str, inner: str, shared: list[str]):
+    """Valeur brute d'une cellule <c> à partir de son type `t` et de son contenu XML."""
+    if not inner:
+        return None
+    if t == "inlineStr":
+        return _unescape("".join(_INLINE_T_RE.findall(inner)))
+    m = _V_RE.search(inner)
+    return None if m is None else _xlsx_v(t, m.group(1), shared)
+
+
+def _xlsx_v(t: str, v: str, shared: list[str]):
+    if t == "s":
+        return shared[int(v)]
+    if t == "str":
+        return _unescape(v)
+    if t == "b":
+        return v == "1"
+    if t == "e":
+        return None
+    return float(v)
+
+
+def _unescape(s: str) -> str:
+    return html.unescape(s) if "&" in s else s
+
+
+def _decode_batch(ts: tuple, vs: tuple, ins: tuple, rests: tuple,
+                  shared: np.ndarray, name: str) -> pd.Series:
+    """
+    Décode un lot de cellules d'une même colonne.
+    Cas homogènes vectorisés (tout numérique / tout chaînes partagées), sinon cellule par cellule.
+    """
+    kinds = set(ts)
+    if not any(rests):
+        if kinds <= {"", "n"} and all(vs):
+            return pd.Series(np.fromiter(map(float, vs), np.float64, len(vs)), name=name)
+        if kinds == {"s"} and all(vs):
+            return pd.Series(shared[np.fromiter(map(int, vs), np.int64, len(vs))], dtype=object, name=name)
+        if kinds == {"inlineStr"}:
+            return pd.Series([_unescape(x) for x in ins], dtype=object, name=name)
+    vals = [_xlsx_value(t, r, shared) if r else
+            (x if t == "inlineStr" else (_xlsx_v(t, v, shared) if v else None))
+            for t, v, x, r in zip(ts, vs, ins, rests)]
+    return pd.Series(vals, dtype=object, name=name)
+
+
+def _read_xlsx_stream(p: Path, columns: Iterable[str] | None = None,
+                      sheet_name: int | str = 0,
+                      batch_size: int = STREAM_BATCH_ROWS,
+                      chunk_bytes: int = 4 << 20) -> pd.DataFrame:
+    """
+    Lecture XLSX en streaming, sans modèle objet du classeur :
+    - décompresse le XML de la feuille par blocs (mémoire bornée)
+    - repère l'en-tête, puis n'extrait QUE les cellules des colonnes conservées
+      (regex compilée sur leurs lettres : les autres cellules sont sautées côté C)
+    - décode et type les colonnes par lots d'environ `batch_size` lignes
+    Lignes conservées comme read_excel(usecols=...) : toutes celles situées entre l'en-tête et
+    la dernière ligne non vide de la feuille (toutes colonnes confondues), y compris celles
+    vides dans les colonnes conservées (=> NaN).
+    NB : les dates sont renvoyées en numéro de série Excel (pas de lecture des styles).
+    Cellules sans référence `r` (rare) => repli sur read_excel.
+    """
+    keep = None if columns is None else {_norm(c) for c in columns}
+
+    with zipfile.ZipFile(p) as z:
+        shared = _xlsx_shared_strings(z)
+        shared_arr = np.asarray(shared, dtype=object)
+        sheet_path = _xlsx_sheet_path(z, sheet_name)
+
+        with z.open(sheet_path) as raw:
+            f = io.TextIOWrapper(raw, encoding="utf-8")
+            text, header = "", None
+            # 1) en-tête = première ligne <row>
+            while header is None:
+                chunk = f.read(chunk_bytes)
+                text += chunk
+                header = _ROW_RE.search(text)
+                if not chunk:
+                    break
+            if header is None:
+                return pd.DataFrame()
+
+            names: list[str] = []
+            letters: list[str] = []
+            header_cells = _CELL_RE.findall(header.group(1))
+            for attrs, inner in header_cells:
+                ref = _ATTR_R.search(attrs)
+                if ref is None:
+                    return _read_xlsx_openpyxl(p, sheet_name, keep)
+                t = _ATTR_T.search(attrs)
+                h = _xlsx_value(t.group(1) if t else "", inner, shared)
+                if h is not None and (keep is None or _norm(h) in keep):
+                    names.append(str(h).strip())
+                    letters.append(ref.group(1))
+            if not names:
+                return pd.DataFrame(columns=names)
+
+            header_row = int(_ATTR_R.search(header_cells[0][0]).group(2))
+            pos = {l: j for j, l in enumerate(letters)}
+            # l'ordre des attributs n'est pas significatif en OOXML : chaque bloc est vérifié.
+            #  - cas usuel (Excel, openpyxl...) : `r` en 1er attribut => motif ancré, échec
+            #    immédiat sur les colonnes ignorées
+            #  - sinon : lookahead sur `r` dans la balise
+            #  - cellules sans `r` (position implicite) : repli openpyxl
+            alt = "|".join(sorted(letters, key=len, reverse=True))
+            # groupes : colonne, ligne, type t, <v>, texte inline <is><t>, reste (formule, rich text...)
+            body_re = (r'(?:[^>]*?\bt="(\w+)")?[^>]*?'
+                       + r'(?:/>|>(?:<(?:\w+:)?v>([^<]*)</(?:\w+:)?v>'
+                       + r'|<(?:\w+:)?is><(?:\w+:)?t(?:\s[^>]*)?>([^<]*)</(?:\w+:)?t></(?:\w+:)?is>)?'
+                       + r'(.*?)</(?:\w+:)?c>)')
+            fast_re = re.compile(r'<(?:\w+:)?c r="(' + alt + r')(\d+)"' + body_re, re.S)
+            any_re = re.compile(r'<(?:\w+:)?c\b(?=[^>]*?\br="(' + alt + r')(\d+)")' + body_re, re.S)
+
+            parts: list[list[pd.Series]] = [[] for _ in names]
+            buf: list[list[tuple]] = [[] for _ in names]
+            text = text[header.end():]
+
+            def flush() -> None:
+                for j in range(len(names)):
+                    if not buf[j]:
+                        continue
+                    rows, ts, vs, ins, rests = zip(*buf[j])
+                    s = _typed_batch(_decode_batch(ts, vs, ins, rests, shared_arr, names[j]))
+                    s.index = np.asarray(rows, dtype=np.int64)
+                    parts[j].append(s)
+                    buf[j].clear()
+
+            pending = 0
+            last_row = header_row
+            while True:
+                chunk = f.read(chunk_bytes)
+                text += chunk
+                # on ne traite que des lignes complètes
+                cut = text.rfind("</row>") if chunk else len(text)
+                if cut > 0 or not chunk:
+                    body, text = (text[:cut], text[cut:]) if chunk else (text, "")
+                    n_cells = len(_ANY_CELL_RE.findall(body))
+                    if n_cells == len(_R_FIRST_CELL_RE.findall(body)):
+                        kept_re = fast_re
+                    elif n_cells == len(_R_CELL_RE.findall(body)):
+                        kept_re = any_re
+                    else:
+                        return _read_xlsx_openpyxl(p, sheet_name, keep)
+                    last_row = max(last_row, _last_data_row(body))
+                    for col, row, t, v, x, rest in kept_re.findall(body):
+                        r = int(row)
+                        if r > header_row:
+                            buf[pos[col]].append((r, t, v, x, rest))
+                    pending = max(len(b) for b in buf)
+                    if pending >= batch_size:
+                        flush()
+                        pending = 0
+                if not chunk:
+                    break
+            if pending:
+                flush()
+
+    if last_row <= header_row:
+        return pd.DataFrame(columns=names)
+    # alignement par numéro de ligne Excel (cellules absentes => NaN), jusqu'à la dernière ligne non vide
+    data = {n: (pd.concat(s) if s else pd.Series(dtype=object, name=n)) for n, s in zip(names, parts)}
+    df = pd.DataFrame(data).reindex(range(header_row + 1, last_row + 1))
+    for n in df.columns[df.dtypes == object]:
+        df[n] = _int_cells(df[n])
+    return df.reset_index(drop=True)
+
+
+def _read_xlsx_openpyxl(p: Path, sheet_name: int | str, keep: set | None) -> pd.DataFrame:
+    """Repli : lecture openpyxl complète (cellules sans référence `r`)."""
+    return pd.read_excel(p, engine="openpyxl", sheet_name=sheet_name,
+                         usecols=lambda c: keep is None or _norm(c) in keep)
+
 
 def _read_csv_smart(p: Path, **kwargs) -> pd.DataFrame:
     """
@@ -32,17 +326,26 @@ def _read_csv_smart(p: Path, **kwargs) -> pd.DataFrame:
     # Dernier essai sans encoding explicite
     return pd.read_csv(p, sep=sep, **kwargs)
 
-def read_table(path: str | Path, **kwargs) -> pd.DataFrame:
+def read_table(path: str | Path, columns: Iterable[str] | None = None, **kwargs) -> pd.DataFrame:
     """
-    Routeur : Excel -> read_excel ; CSV/TXT -> _read_csv_smart
+    Routeur : XLSX/XLSM -> _read_xlsx_stream ; autres Excel -> read_excel ; CSV/TXT -> _read_csv_smart
+    - columns : en-têtes à conserver (comparés après strip/lower), None = toutes
     """
     p = Path(path)
     assert p.exists(), f"Fichier introuvable: {p}"
     suf = p.suffix.lower()
+    keep = None if columns is None else {_norm(c) for c in columns}
 
+    # projection de colonnes => streaming, tant qu'on ne demande pas d'options propres à read_excel
+    if suf in STREAM_SUFFIXES and keep is not None and set(kwargs) <= {"sheet_name", "batch_size"}:
+        return _read_xlsx_stream(p, keep, **kwargs)
     if suf in EXCEL_SUFFIXES:
+        if keep is not None:
+            kwargs.setdefault("usecols", lambda c: _norm(c) in keep)
         return pd.read_excel(p, engine="openpyxl", **kwargs)
     if suf in CSV_SUFFIXES:
+        if keep is not None:
+            kwargs.setdefault("usecols", lambda c: _norm(c) in keep)
         return _read_csv_smart(p, **kwargs)
     raise ValueError(f"Extension non supportée: {p.name}")
 
@@ -1,19 +1,54 @@
 # src/orchestration/pipeline.py
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
+import time
 import pandas as pd
+import yaml
 
-from src.utils.paths import staging_dir, outputs_dir
-from src.ingestion.readers import read_table, read_csv
-from src.ingestion.cleaner import clean_and_join
+from src.utils.paths import data_dir, staging_dir, outputs_dir, timestamped_path
+from src.ingestion.readers import read_table, EXCEL_SUFFIXES
+from src.ingestion.cleaner import clean_and_join, _coalesce, COLS_RESEAU, COLS_BATS, COLS_INFRA
 from src.ingestion.syncer import apply_business_csv
+from src.ingestion.differ import diff_inputs, save_hashes
 from src.preparation.buildings_priority import add_building_priority
 from src.preparation.enrichments import enrich_costs_and_flags
 from src.analytics.baselines import compute_kpis, save_kpis
-from src.analytics.plan_greedy import greedy_plan
-from src.exports.writers import save_csv
-from src.analytics.work_organizer import build_work_orders
+from src.analytics.plan_greedy import iter_plan_steps, batch_steps
+from src.analytics.plan_components import iter_plan_steps_by_components, components_summary
+from src.exports.writers import save_csv, CsvStream, prune_timestamped
+from src.exports.run_store import RunStore
+from src.viz.tiles import build_mbtiles, segment_summary
+from src.analytics.work_organizer import build_work_orders, build_fanout, iter_phases, WorkOrderStream
+from src.analytics.zoning import load_points, assign_zones, DEFAULT_ZONE_HOURS, DEFAULT_CELL_M
+from src.analytics.sequencing import WorkOrderSequencer, DEFAULT_WINDOW, DEFAULT_TIME_LIMIT_S
+from src.analytics.risk import risk_aggregates, simulate_aggregates
+from src.analytics.curves import ExecutionTrace, compute_reconnection_curves, curves_report, reconnection_delay
+
+
+def _timed_read(path: str, kwargs: dict) -> tuple[pd.DataFrame, float]:
+    """Lecture d'un fichier + durée de parsing (exécutée dans un worker)."""
+    t = time.perf_counter()
+    df = read_table(path, **kwargs)
+    return df, time.perf_counter() - t
+
+
+@contextmanager
+def _process_pool(n: int):
+    """Pool de processus pour les fichiers Excel ; None (=> threads) si inutile ou indisponible."""
+    if n <= 0:
+        yield None
+        return
+    try:
+        pool = ProcessPoolExecutor(max_workers=n)
+    except (OSError, NotImplementedError):
+        yield None
+        return
+    with pool:
+        yield pool
 
 
 class ElectricNetworkPipeline:
@@ -34,32 +69,278 @@ class ElectricNetworkPipeline:
             # optionnels :
             "travaux":         "data/inputs/travaux.csv",
             "costs_yaml":      "configs/costs.yaml",
+            "project_yaml":    "configs/project.yaml",
+            "infra_shp":       "data/inputs/infrastructures.shp",  # zonage (geopandas)
+            "batiments_shp":   "data/inputs/batiments.shp",
           }
         """
         self.paths = paths
         self.crs = crs_metric
         self.staged: dict[str, str] = {}
         self.outputs: dict[str, str] = {}
+        self.timings: dict = {}
+        self.reports: dict[str, dict] = {}   # rapports JSON du run (historisés dans le run store)
+        self.changed_keys: dict[str, list] | None = None  # id_batiment / infra_id touchés depuis la livraison précédente
+        self.input_hashes: dict[str, pd.DataFrame] = {}    # empreintes de la livraison, enregistrées en fin de run
 
     # ------------------------------
     # Helpers
     # ------------------------------
     def _read_inputs(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame | None, pd.DataFrame | None]:
-        # Reseau (XLSX) + Batiments/Infra (CSV)
-        df_reseau = read_table(self.paths["reseau_en_arbre"])           # xlsx
-        df_bat    = read_csv(self.paths["batiments"])                    # csv
-        df_infra  = read_csv(self.paths["infra"])                        # csv
-        df_trav   = read_csv(self.paths["travaux"]) if self.paths.get("travaux") else None
+        # Reseau (XLSX) + Batiments/Infra (CSV), lus en parallèle :
+        #  - XLSX : parsing pur Python => pool de processus (contourne le GIL)
+        #  - CSV  : parser C de pandas (relâche le GIL) => pool de threads
+        # En-têtes + _coalesce appliqués dès qu'un fichier est prêt.
+        reseau_cols = [a for aliases in COLS_RESEAU.values() for a in aliases]
+        jobs = {
+            "reseau": (self.paths["reseau_en_arbre"], {"columns": reseau_cols}, COLS_RESEAU),
+            "bat":    (self.paths["batiments"], {}, COLS_BATS),
+            "infra":  (self.paths["infra"], {}, COLS_INFRA),
+        }
+        if self.paths.get("travaux"):
+            jobs["trav"] = (self.paths["travaux"], {}, None)
 
-        # Normalisation légère des en-têtes
-        for df in (df_reseau, df_bat, df_infra):
-            df.columns = [c.strip().lower() for c in df.columns]
+        frames: dict[str, pd.DataFrame | None] = {"trav": None}
+        t0 = time.perf_counter()
+        n_xlsx = sum(Path(path).suffix.lower() in EXCEL_SUFFIXES for path, _, _ in jobs.values())
+        with ThreadPoolExecutor(max_workers=len(jobs)) as threads, \
+             _process_pool(n_xlsx) as procs:
+            futures = {}
+            for name, (path, kwargs, _) in jobs.items():
+                pool = procs if (procs is not None and Path(path).suffix.lower() in EXCEL_SUFFIXES) else threads
+                futures[pool.submit(_timed_read, path, kwargs)] = name
+
+            for fut in as_completed(futures):
+                name = futures[fut]
+                df, parse_s = fut.result()
+                t = time.perf_counter()
+                mapping = jobs[name][2]
+                if mapping is not None:
+                    df = _coalesce(df, mapping)
+                else:
+                    df.columns = [c.strip().lower() for c in df.columns]
+                frames[name] = df
+                self.timings[f"ingest_{name}"] = {"parse_s": round(parse_s, 3),
+                                                  "normalize_s": round(time.perf_counter() - t, 3)}
+                print(f"[INGEST] {name}:{df.shape} parse {parse_s:.2f}s + normalisation {time.perf_counter() - t:.2f}s")
+        self.timings["ingest_total_s"] = round(time.perf_counter() - t0, 3)
+
+        df_reseau, df_bat, df_infra, df_trav = frames["reseau"], frames["bat"], frames["infra"], frames["trav"]
 
         # Trace utile
-        print(f"[INGEST] reseau:{df_reseau.shape} bat:{df_bat.shape} infra:{df_infra.shape} trav:{None if df_trav is None else df_trav.shape}")
+        print(f"[INGEST] reseau:{df_reseau.shape} bat:{df_bat.shape} infra:{df_infra.shape} "
+              f"trav:{None if df_trav is None else df_trav.shape} en {self.timings['ingest_total_s']:.2f}s")
 
         return df_reseau, df_bat, df_infra, df_trav
 
+    def _diff_inputs(self, frames: dict[str, pd.DataFrame | None]) -> None:
+        """
+        Lignes ajoutées/supprimées/modifiées par table + clés touchées (staging),
+        avec ancienne/nouvelle valeur de chaque cellule modifiée (input_changes).
+        """
+        sdir = staging_dir()
+        changes, report, self.input_hashes = diff_inputs(
+            frames, {"reseau": COLS_RESEAU, "bat": COLS_BATS, "infra": COLS_INFRA}, sdir / "input_hashes")
+        self.staged["input_diff"] = str(save_kpis(report, sdir / "input_diff.json"))
+        if changes:
+            self.changed_keys = {k: v["keys"] for k, v in report["affected"].items()}
+            all_changes = pd.concat([c.assign(table=t) for t, c in changes.items()], ignore_index=True)
+            if len(all_changes):
+                self.staged["input_changes"] = str(save_csv(all_changes, sdir / "input_changes"))
+        # dans le run store : comptes seulement (les listes de clés restent dans input_diff.json)
+        self.reports["input_diff"] = {
+            "tables": report["tables"],
+            "affected": {k: v["count"] for k, v in report["affected"].items()},
+        }
+        summary = ", ".join(
+            f"{t}: baseline" if r["baseline"] else f"{t}: +{r['added']} -{r['removed']} ~{r['modified']}"
+            for t, r in report["tables"].items()
+        )
+        print(f"[DIFF] {summary}")
+
+    def _project_cfg(self) -> dict:
+        """Paramètres de modélisation (configs/project.yaml) ; {} si absent."""
+        p = Path(self.paths.get("project_yaml", "configs/project.yaml"))
+        if not p.exists():
+            return {}
+        with open(p, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+
+    def _plan_steps(self, df_enrich: pd.DataFrame, bat_prio: pd.DataFrame, greedy_cfg: dict):
+        """Flux des étapes du plan (global, ou par composantes indépendantes fusionnées — résultat identique)."""
+        if greedy_cfg.get("by_components"):
+            print(f"[PLAN] composantes: {components_summary(df_enrich)}")
+            return iter_plan_steps_by_components(df_enrich, bat_prio, max_workers=greedy_cfg.get("max_workers"))
+        return iter_plan_steps(df_enrich, bat_prio)
+
+    def _plan_batch(self, df_enrich: pd.DataFrame, bat_prio: pd.DataFrame,
+                    costs_yaml: str, greedy_cfg: dict, normalized: bool) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+        odir = outputs_dir()
+        plan_df = pd.DataFrame(list(self._plan_steps(df_enrich, bat_prio, greedy_cfg)))
+        self.outputs["plan_glouton"] = str(save_csv(plan_df, odir / "plan_glouton"))
+
+        work_orders, phases_summary, meta = build_work_orders(
+            df_enrich=df_enrich,
+            plan_df=plan_df,
+            costs_yaml=costs_yaml,
+            normalized=normalized,
+        )
+        self.outputs["phases_summary"] = str(save_csv(phases_summary, odir / "phases_summary"))
+        return plan_df, work_orders, meta
+
+    def _plan_streaming(self, df_enrich: pd.DataFrame, bat_prio: pd.DataFrame, costs_yaml: str,
+                        greedy_cfg: dict, normalized: bool,
+                        on_plan: Callable[[pd.DataFrame], None]) -> WorkOrderStream:
+        """
+        Plan et ordres de travaux produits lot par lot pendant la planification : chaque lot
+        du plan est écrit (plan_glouton) et passé à on_plan dès sa sortie ; le flux rendu donne
+        les work orders (phases croissantes, cf. iter_phases). Rien n'est relu depuis le disque.
+        """
+        batches = batch_steps(self._plan_steps(df_enrich, bat_prio, greedy_cfg),
+                              int(greedy_cfg.get("batch_size", 256)))
+        return WorkOrderStream(df_enrich, self._tap_plan(batches, on_plan), costs_yaml, normalized=normalized)
+
+    def _tap_plan(self, batches: Iterable[pd.DataFrame],
+                  on_plan: Callable[[pd.DataFrame], None]) -> Iterator[pd.DataFrame]:
+        with CsvStream(outputs_dir() / "plan_glouton") as plan_out:
+            for batch in plan_out.tap(batches):
+                on_plan(batch)
+                yield batch
+        self.outputs["plan_glouton"] = str(plan_out.path)
+
+    def _load_points(self) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+        """Coordonnées tronçons/bâtiments (shapefiles) pour zonage et séquencement ; None si indisponibles."""
+        if not (self.paths.get("infra_shp") or self.paths.get("batiments_shp")):
+            return None
+        try:
+            return load_points(self.paths.get("infra_shp"), self.paths.get("batiments_shp"))
+        except (ImportError, OSError, RuntimeError) as e:  # geopandas absent / shapefile illisible
+            print(f"[GEO] coordonnées indisponibles, zonage/séquencement ignorés : {e}")
+            return None
+
+    def _organize(self, phases: Iterable[pd.DataFrame], points: tuple[pd.DataFrame, pd.DataFrame] | None,
+                  project_cfg: dict, total_cost: float, risk: bool,
+                  on_work_orders: Callable[[pd.DataFrame], None]) -> dict:
+        """
+        Zonage, séquencement et écriture de work_orders phase par phase (phases complètes et
+        croissantes : zonage et séquencement ne franchissent pas une frontière de phase).
+        Seuls des résumés sont gardés : traces pour les courbes et le retard de raccordement,
+        synthèse des zones, agrégats du risque, attributs des tronçons pour les tuiles.
+        """
+        zoning_cfg = project_cfg.get("zoning") or {}
+        seq_cfg = project_cfg.get("sequencing") or {}
+        tiles = (project_cfg.get("tiles") or {}).get("enabled", False) and self.paths.get("infra_shp")
+        zoning = points is not None and zoning_cfg.get("enabled", True)
+        sequencer = None
+        if points is not None and seq_cfg.get("enabled", False):
+            sequencer = WorkOrderSequencer(*points, total_cost=total_cost,
+                                           window=int(seq_cfg.get("window", DEFAULT_WINDOW)),
+                                           time_limit_s=float(seq_cfg.get("time_limit_s", DEFAULT_TIME_LIMIT_S)))
+        acc = {"plan_trace": ExecutionTrace(), "seq_trace": ExecutionTrace() if sequencer is not None else None,
+               "sequencer": sequencer, "zones": [], "risk": [], "segments": []}
+
+        with CsvStream(outputs_dir() / "work_orders") as wo_out:
+            for wo in phases:
+                # ordre du plan (courbes), avant le réordonnancement spatial
+                acc["plan_trace"].add(wo)
+                if zoning:
+                    wo, zones = assign_zones(
+                        wo, *points,
+                        zone_hours=float(zoning_cfg.get("zone_hours", DEFAULT_ZONE_HOURS)),
+                        cell_m=float(zoning_cfg.get("cell_m", DEFAULT_CELL_M)),
+                    )
+                    acc["zones"].append(zones)
+                if sequencer is not None:
+                    wo = sequencer.add(wo)
+                    acc["seq_trace"].add(wo)
+                wo_out.write(wo)
+                on_work_orders(wo)
+                if risk:
+                    acc["risk"].append(risk_aggregates(wo))
+                if tiles:
+                    acc["segments"].append(segment_summary(wo))
+        self.outputs["work_orders"] = str(wo_out.path)
+
+        if zoning and acc["zones"]:
+            zones = pd.concat(acc["zones"], ignore_index=True).sort_values(["phase", "zone"], kind="stable")
+            self.outputs["zones_summary"] = str(save_csv(zones.reset_index(drop=True), outputs_dir() / "zones_summary"))
+            print(f"[ZONES] {len(zones)} zones, {zones['time_total_h'].mean():.1f} h/zone en moyenne")
+        return acc
+
+    def _sequencing_report(self, acc: dict, plan_houses: pd.DataFrame, bat_prio: pd.DataFrame,
+                           fanout: pd.DataFrame | None) -> None:
+        """Rapport des distances et du retard de raccordement dû au séquencement."""
+        report = acc["sequencer"].report()
+        report["reconnection"] = reconnection_delay(plan_houses, acc["plan_trace"], acc["seq_trace"], bat_prio, fanout)
+        self.reports["sequencing"] = report
+        self.staged["sequencing_report"] = str(save_kpis(report, staging_dir() / "sequencing_report.json"))
+        print(f"[SEQ] déplacements {report['travel_m_before']:.0f} m -> {report['travel_m_after']:.0f} m "
+              f"(-{report['saved_pct']:.1f} %) en {report['time_s']:.2f}s ; "
+              f"{report['reconnection']['houses_delayed']:.0f} maisons raccordées plus tard "
+              f"(+{report['reconnection']['mean_delay_h_delayed']:.1f} h en moyenne)")
+
+    def _costs_cfg(self, costs_yaml: str) -> dict:
+        p = Path(costs_yaml)
+        if not p.exists():
+            return {}
+        with open(p, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+
+    def _simulate_risk(self, risk_agg: pd.DataFrame, costs_cfg: dict) -> None:
+        risk_phases, report = simulate_aggregates(risk_agg, costs_cfg)
+        self.reports["risk"] = report
+        self.outputs["risk_phases"] = str(save_csv(risk_phases, outputs_dir() / "risk_phases"))
+        self.staged["risk_report"] = str(save_kpis(report, staging_dir() / "risk_report.json"))
+        if "p_hospital_before_generator" in report:
+            print(f"[RISK] {report['n_scenarios']} scénarios : P(hôpital avant fin du groupe) = "
+                  f"{report['p_hospital_before_generator']:.1%}, P(dans la marge) = {report['p_hospital_within_margin']:.1%}")
+
+    def _export_tiles(self, segments: pd.DataFrame, pairs: pd.DataFrame, tiles_cfg: dict) -> None:
+        """segments : résumés segment_summary des phases ; pairs : bâtiment × tronçon (n_buildings)."""
+        out = timestamped_path("plan_tiles", "mbtiles")
+        try:
+            report = build_mbtiles(
+                self.paths["infra_shp"], segments, out,
+                min_zoom=int(tiles_cfg.get("min_zoom", 12)),
+                max_zoom=int(tiles_cfg.get("max_zoom", 18)),
+                detail_zoom=int(tiles_cfg.get("detail_zoom", 15)),
+                simplify_px=float(tiles_cfg.get("simplify_px", 1.0)),
+                max_workers=tiles_cfg.get("max_workers"),
+                fanout=pairs,
+            )
+        except (ImportError, OSError, RuntimeError) as e:  # geopandas absent / shapefile illisible
+            print(f"[TILES] export ignoré : {e}")
+            return
+        except AttributeError as e:                        # shapely 1.x : API vectorisée absente
+            print(f"[TILES] export ignoré (shapely >= 2 requis) : {e}")
+            return
+        self.outputs["plan_tiles"] = report["path"]
+        print(f"[TILES] {report['n_tiles']} tuiles {report['tiles_per_zoom']} -> {report['path']}")
+
+    def _open_run(self, store_cfg: dict, project_cfg: dict, normalized: bool) -> tuple[RunStore, int]:
+        """Run ouvert avant la planification : plan et work orders y sont ajoutés lot par lot."""
+        store = RunStore(store_cfg.get("path") or data_dir() / "runs.sqlite")
+        run_id = store.start_run({"paths": self.paths, "project": project_cfg}, normalized=normalized)
+        return store, run_id
+
+    def _record_run(self, store: RunStore, run_id: int, store_cfg: dict,
+                    pairs: pd.DataFrame, meta: dict) -> int:
+        """
+        Clôt le run (fan-out, KPIs, statut) puis applique la rétention (runs en base et
+        exports horodatés de staging/ et outputs/) ; renvoie run_id.
+        """
+        keep_last, keep_days = store_cfg.get("keep_last"), store_cfg.get("keep_days")
+        store.add_fanout(run_id, pairs)
+        store.add_kpis(run_id, "hospital", meta)
+        for source, report in self.reports.items():
+            store.add_kpis(run_id, source, report)
+        store.finish_run(run_id)
+        pruned = store.prune(keep_last=keep_last, older_than_days=keep_days)
+        files = prune_timestamped([staging_dir(), outputs_dir()], keep_last=keep_last, older_than_days=keep_days)
+        print(f"[STORE] run {run_id} enregistré dans {store.path}" + (f" ({pruned} anciens runs purgés)" if pruned else "")
+              + (f" ; {files} anciens exports supprimés" if files else ""))
+        return run_id
+
     def _stage_exports(self, df_sync: pd.DataFrame, infra_base: pd.DataFrame,
                        bat_prio: pd.DataFrame, kpi_path: Path) -> None:
         sdir = staging_dir()
@@ -75,8 +356,13 @@ class ElectricNetworkPipeline:
         # 1) Read inputs (xlsx + csv)
         df_reseau, df_bat, df_infra, df_trav = self._read_inputs()
 
+        # 1b) Changements vs livraison précédente (empreintes de lignes après _coalesce)
+        project_cfg = self._project_cfg()
+        if (project_cfg.get("input_diff") or {}).get("enabled", True):
+            self._diff_inputs({"reseau": df_reseau, "bat": df_bat, "infra": df_infra})
+
         # 2) Clean + join (aligne les colonnes, corrige nb_maisons via batiments, joint avec infra)
-        df_joined, infra_base, bat_base = clean_and_join(df_reseau, df_bat, df_infra)
+        df_joined, infra_base, bat_base = clean_and_join(df_reseau, df_bat, df_infra, coalesced=True)
 
         # 3) Synchronisation métier (CSV "travaux & missions" : surclasse/complète les attributs)
         df_sync = apply_business_csv(df_joined, df_trav)
@@ -90,6 +376,7 @@ class ElectricNetworkPipeline:
 
         # 6) KPIs de base (répartition longueurs/coûts/temps par type d’infra)
         kpis = compute_kpis(df_enrich)
+        self.reports["kpi_baseline"] = kpis
         kpi_path = save_kpis(kpis, staging_dir() / "kpi_baseline.json")
 
         # 7) Exports STAGING (datasets de référence pour audit)
@@ -102,22 +389,90 @@ class ElectricNetworkPipeline:
         self.outputs["segments_a_reparer"] = str(save_csv(seg_rep, odir / "segments_a_reparer"))
         self.outputs["segments_ok"]        = str(save_csv(seg_ok,  odir / "segments_ok"))
 
-        # 9) Plan glouton
-        plan_df = greedy_plan(df_enrich, bat_prio)
-        self.outputs["plan_glouton"] = str(save_csv(plan_df, odir / "plan_glouton"))
+        # 9-10) Plan glouton + organisation des travaux (Hôpital phase 0 + phases 40/20/20/20)
+        #       puis, phase par phase : zonage, séquencement, écriture de work_orders et du run store
+        greedy_cfg = project_cfg.get("greedy") or {}
+        zoning_cfg = project_cfg.get("zoning") or {}
+        seq_cfg = project_cfg.get("sequencing") or {}
+        points = None
+        if zoning_cfg.get("enabled", True) or seq_cfg.get("enabled", False):
+            points = self._load_points()
+        normalized = bool((project_cfg.get("work_orders") or {}).get("normalized", False))
+        costs_cfg = self._costs_cfg(costs_yaml)
+        risk = (costs_cfg.get("simulation") or {}).get("enabled", False)
 
-        # 10) Organisation des travaux (Hôpital phase 0 + phases 40/20/20/20)
-        work_orders, phases_summary, meta = build_work_orders(
-            df_enrich=df_enrich,
-            plan_df=plan_df,
-            costs_yaml=costs_yaml
-        )
-        self.outputs["work_orders"]    = str(save_csv(work_orders,    odir / "work_orders"))
-        self.outputs["phases_summary"] = str(save_csv(phases_summary, odir / "phases_summary"))
+        result = {"staging": self.staged, "outputs": self.outputs, "timings": self.timings}
+        store_cfg = project_cfg.get("run_store") or {}
+        store, run_id = self._open_run(store_cfg, project_cfg, normalized) if store_cfg.get("enabled", True) else (None, None)
+        try:
+            plan_keys: list[pd.DataFrame] = []   # id_batiment / nb_houses du plan (courbes)
+
+            def on_plan(batch: pd.DataFrame) -> None:
+                plan_keys.append(batch[["id_batiment", "nb_houses"]])
+                if store is not None:
+                    store.append_plan(run_id, batch)
+
+            def on_work_orders(wo: pd.DataFrame) -> None:
+                if store is not None:
+                    store.append_work_orders(run_id, wo)
+
+            if greedy_cfg.get("streaming"):
+                stream = self._plan_streaming(df_enrich, bat_prio, costs_yaml, greedy_cfg, normalized, on_plan)
+                acc = self._organize(iter_phases(stream), points, project_cfg, stream.total_cost_all, risk, on_work_orders)
+                meta, pairs = stream.meta, stream.fanout()
+                self.outputs["phases_summary"] = str(save_csv(stream.phases_summary(), odir / "phases_summary"))
+            else:
+                plan_df, work_orders, meta = self._plan_batch(df_enrich, bat_prio, costs_yaml, greedy_cfg, normalized)
+                on_plan(plan_df)
+                acc = self._organize(iter_phases([work_orders]), points, project_cfg,
+                                     float(work_orders["cost_total"].sum()), risk, on_work_orders)
+                pairs = build_fanout(df_enrich, plan_df)
+            plan_houses = (pd.concat(plan_keys, ignore_index=True) if plan_keys
+                           else pd.DataFrame(columns=["id_batiment", "nb_houses"]))
+
+            fanout = None
+            if meta["normalized"]:
+                # mode normalisé : 1 tâche par infra + table bâtiment ↔ tâche
+                fanout = pairs
+                self.outputs["work_orders_fanout"] = str(save_csv(fanout, odir / "work_orders_fanout"))
+
+            # 10a) Courbes de raccordement (maisons vs coût/heures cumulés) dans l'ordre du plan,
+            #      avant le réordonnancement spatial ; à côté de kpi_baseline.json
+            curve_steps, curve_phases, markers = compute_reconnection_curves(plan_houses, acc["plan_trace"], bat_prio, fanout)
+            self.staged["reconnection_curve"]  = str(save_csv(curve_steps, staging_dir() / "reconnection_curve"))
+            self.reports["reconnection"] = curves_report(curve_phases, markers)
+            self.staged["reconnection_kpis"]   = str(save_kpis(self.reports["reconnection"],
+                                                               staging_dir() / "reconnection_kpis.json"))
+
+            # 10c) Séquencement : distances et retard de raccordement
+            if acc["sequencer"] is not None:
+                self._sequencing_report(acc, plan_houses, bat_prio, fanout)
+
+            # 10d) Risque : Monte Carlo des cadences / équipes (durées, coûts, délai hôpital)
+            if risk and acc["risk"]:
+                self._simulate_risk(pd.concat(acc["risk"], ignore_index=True), costs_cfg)
+
+            # 11) Tuiles vectorielles multi-résolution (MBTiles) pour QGIS / tableaux de bord
+            if acc["segments"]:
+                self._export_tiles(pd.concat(acc["segments"], ignore_index=True), pairs, project_cfg.get("tiles") or {})
+
+            if not meta["hospital_margin_ok"]:
+                print(f"⚠️ HÔPITAL: {meta['hospital_time_needed_h']:.2f} h > objectif {meta['hospital_time_goal_h']:.2f} h (marge 20% NON respectée)")
+            else:
+                print(f"✅ HÔPITAL: {meta['hospital_time_needed_h']:.2f} h ≤ objectif {meta['hospital_time_goal_h']:.2f} h")
 
-        if not meta["hospital_margin_ok"]:
-            print(f"⚠️ HÔPITAL: {meta['hospital_time_needed_h']:.2f} h > objectif {meta['hospital_time_goal_h']:.2f} h (marge 20% NON respectée)")
-        else:
-            print(f"✅ HÔPITAL: {meta['hospital_time_needed_h']:.2f} h ≤ objectif {meta['hospital_time_goal_h']:.2f} h")
+            # 12) Historique : run + plan + work orders + KPIs dans le run store (SQLite)
+            if store is not None:
+                result["run_id"] = self._record_run(store, run_id, store_cfg, pairs, meta)
+        except BaseException:
+            if store is not None:
+                store.finish_run(run_id, status="failed")
+            raise
+        finally:
+            if store is not None:
+                store.close()
 
-        return {"staging": self.staged, "outputs": self.outputs}
+        # 13) Run réussi : la livraison devient la référence du prochain diff
+        for table, hashes in self.input_hashes.items():
+            save_hashes(hashes, staging_dir() / "input_hashes", table)
+        return result
@@ -0,0 +1,376 @@
+# src/viz/tiles.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import gzip
+import json
+import math
+import os
+import sqlite3
+import struct
+import numpy as np
+import pandas as pd
+
+from src.ingestion.cleaner import _coalesce, COLS_INFRA
+from src.analytics.zoning import _read_shp
+
+# Web Mercator (EPSG:3857)
+ORIGIN = 20037508.342789244
+EXTENT = 4096                      # résolution interne d'une tuile MVT
+LAYER_SEGMENTS = "segments"        # zooms détaillés : 1 entité par tronçon
+LAYER_PHASES = "phases"            # zooms bas : tronçons fusionnés par (tuile, phase)
+NO_WORKS_PHASE = -1                # tronçon sans travaux (intact)
+# en dessous, le coût de démarrage des processus dépasse le gain
+MIN_TILES_FOR_POOL = 64
+
+
+# ------------------------
+# Encodage Mapbox Vector Tile (protobuf écrit à la main)
+# ------------------------
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _tag(field: int, wire: int) -> bytes:
+    return _varint((field << 3) | wire)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _tag(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, ints: Iterable[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(i) for i in ints))
+
+
+def _value(v: Any) -> bytes:
+    """Message Value : string(1), double(3), sint64(6), bool(7)."""
+    if isinstance(v, (bool, np.bool_)):
+        return _tag(7, 0) + _varint(int(v))
+    if isinstance(v, (int, np.integer)):
+        return _tag(6, 0) + _varint(_zigzag(int(v)) & 0xFFFFFFFFFFFFFFFF)
+    if isinstance(v, (float, np.floating)):
+        return _tag(3, 1) + struct.pack("<d", float(v))
+    return _bytes_field(1, str(v).encode("utf-8"))
+
+
+def _geometry(parts: List[np.ndarray]) -> List[int]:
+    """Commandes MoveTo/LineTo (deltas zigzag) ; parties de moins de 2 points ignorées."""
+    cmds: List[int] = []
+    cx = cy = 0
+    for p in parts:
+        if len(p) > 1:
+            keep = np.concatenate([[True], (np.diff(p, axis=0) != 0).any(axis=1)])
+            p = p[keep]
+        if len(p) < 2:
+            continue
+        pts = p.tolist()
+        x, y = pts[0]
+        cmds += [(1 & 0x7) | (1 << 3), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        cmds.append((2 & 0x7) | ((len(pts) - 1) << 3))
+        for x, y in pts[1:]:
+            cmds += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+    return cmds
+
+
+def encode_layer(name: str, features: List[Tuple[List[np.ndarray], Dict[str, Any]]]) -> bytes:
+    """Couche MVT v2 de lignes ; features = [(parties en pixels tuile, propriétés)]."""
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, Any], int] = {}
+    body = bytearray()
+    for fid, (parts, props) in enumerate(features, start=1):
+        geom = _geometry(parts)
+        if not geom:
+            continue
+        tags: List[int] = []
+        for k, v in props.items():
+            if v is None or (isinstance(v, float) and math.isnan(v)):
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v), v), len(values)))
+        feat = _tag(1, 0) + _varint(fid) + _packed(2, tags) + _tag(3, 0) + _varint(2) + _packed(4, geom)
+        body += _bytes_field(2, feat)
+    if not body:
+        return b""
+    layer = _tag(15, 0) + _varint(2) + _bytes_field(1, name.encode("utf-8")) + bytes(body)
+    layer += b"".join(_bytes_field(3, k.encode("utf-8")) for k in keys)
+    layer += b"".join(_bytes_field(4, _value(v)) for (_, v) in values)
+    layer += _tag(5, 0) + _varint(EXTENT)
+    return _bytes_field(3, layer)
+
+
+# ------------------------
+# Tuiles (worker)
+# ------------------------
+
+def _tile_size(z: int) -> float:
+    return 2 * ORIGIN / (1 << z)
+
+
+def _encode_tiles(jobs: List[Tuple[int, int, int, str, list]]) -> List[Tuple[int, int, int, bytes]]:
+    """Worker : coordonnées monde -> pixels tuile, encodage MVT, gzip. jobs = [(z, x, y, couche, entités)]."""
+    out = []
+    for z, x, y, layer, feats in jobs:
+        size = _tile_size(z)
+        minx, maxy = -ORIGIN + x * size, ORIGIN - y * size
+        scale = EXTENT / size
+        px_feats = []
+        for parts, props in feats:
+            px = [np.column_stack([np.rint((p[:, 0] - minx) * scale), np.rint((maxy - p[:, 1]) * scale)]).astype(np.int64)
+                  for p in parts]
+            px_feats.append((px, props))
+        data = encode_layer(layer, px_feats)
+        if data:
+            out.append((z, x, y, gzip.compress(data, compresslevel=6, mtime=0)))
+    return out
+
+
+# ------------------------
+# Pyramide
+# ------------------------
+
+def segment_summary(work_orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    Une ligne par tronçon (phase et plan_order min, coût / temps / zone de la 1re tâche).
+    Agrégats stables par concaténation : en streaming, les résumés de chaque phase mis
+    bout à bout peuvent remplacer work_orders dans build_mbtiles (avec fanout).
+    """
+    wo = work_orders.assign(infra_id=work_orders["infra_id"].astype(str))
+    agg = {"phase": ("phase", "min"), "plan_order": ("plan_order", "min"),
+           "cost_total": ("cost_total", "first"), "time_total_h": ("time_total_h", "first")}
+    if "zone" in wo.columns:
+        agg["zone"] = ("zone", "first")
+    return wo.groupby("infra_id", sort=False).agg(**agg).reset_index()
+
+
+def _segment_attrs(infra_ids: pd.Series, work_orders: pd.DataFrame,
+                   fanout: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Attributs par tronçon depuis work_orders (une infra peut servir plusieurs bâtiments) ;
+    n_buildings est compté sur fanout (paires bâtiment × infra) quand il est fourni : en mode
+    normalisé, work_orders n'a plus qu'une ligne par infra.
+    """
+    wo = work_orders.assign(infra_id=work_orders["infra_id"].astype(str))
+    a = segment_summary(wo).set_index("infra_id")
+    pairs = wo if fanout is None else fanout.assign(infra_id=fanout["infra_id"].astype(str))
+    a.insert(4, "n_buildings", pairs.groupby("infra_id", sort=False)["id_batiment"].nunique())
+    a = a.reindex(infra_ids.astype(str).to_numpy())
+    a["phase"] = a["phase"].fillna(NO_WORKS_PHASE)   # même code que la couche phases pour les tronçons intacts
+    return a
+
+
+def _tiles_for_bounds(bounds: np.ndarray, z: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(indice segment, x, y) pour chaque tuile XYZ touchée par la bbox de chaque segment."""
+    n = 1 << z
+    size = _tile_size(z)
+    tx0 = np.clip(np.floor((bounds[:, 0] + ORIGIN) / size), 0, n - 1).astype(np.int64)
+    tx1 = np.clip(np.floor((bounds[:, 2] + ORIGIN) / size), 0, n - 1).astype(np.int64)
+    ty0 = np.clip(np.floor((ORIGIN - bounds[:, 3]) / size), 0, n - 1).astype(np.int64)
+    ty1 = np.clip(np.floor((ORIGIN - bounds[:, 1]) / size), 0, n - 1).astype(np.int64)
+    nx, ny = tx1 - tx0 + 1, ty1 - ty0 + 1
+    cnt = nx * ny
+    seg = np.repeat(np.arange(len(bounds)), cnt)
+    k = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    return seg, tx0[seg] + k % nx[seg], ty0[seg] + k // nx[seg]
+
+
+def _props(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Propriétés d'un tronçon : NaN retirés, compteurs/rangs en entiers."""
+    out = {}
+    for k, v in rec.items():
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            continue
+        out[k] = int(v) if k in ("phase", "plan_order", "n_buildings") else v
+    return out
+
+
+def _tile_keys(bounds: np.ndarray, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(indice segment, clé x * 2^z + y) des tuiles touchées par chaque bbox."""
+    seg, tx, ty = _tiles_for_bounds(bounds, z)
+    return seg, tx * (1 << z) + ty
+
+
+def _zoom_jobs(geoms: np.ndarray, attrs: pd.DataFrame, ids: np.ndarray, z: int, detail_zoom: int,
+               simplify_px: float, keys: np.ndarray | None = None) -> Iterator[Tuple[int, int, int, str, list]]:
+    """
+    Géométries simplifiées au zoom z, réparties par tuile (et fusionnées par phase sous detail_zoom).
+    keys : tuiles à produire (clés de _tile_keys), toutes si None.
+    """
+    import shapely
+
+    g = shapely.simplify(geoms, _tile_size(z) / 256.0 * simplify_px, preserve_topology=False)
+    coords, idx = shapely.get_coordinates(g, return_index=True)
+    cuts = np.flatnonzero(np.diff(idx)) + 1
+    parts = np.split(coords, cuts)
+    owner = idx[np.concatenate([[0], cuts])] if len(idx) else np.array([], dtype=np.int64)
+    per_seg: List[np.ndarray | None] = [None] * len(geoms)
+    for o, p in zip(owner.tolist(), parts):
+        per_seg[o] = p
+
+    seg, tx, ty = _tiles_for_bounds(shapely.bounds(g), z)
+    if keys is not None:
+        m = np.isin(tx * (1 << z) + ty, keys)
+        seg, tx, ty = seg[m], tx[m], ty[m]
+    order = np.lexsort((seg, ty, tx))
+    seg, tx, ty = seg[order], tx[order], ty[order]
+    starts = np.flatnonzero(np.concatenate([[True], (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1])]))
+    ends = np.append(starts[1:], len(seg))
+
+    phase = attrs["phase"].to_numpy()
+    cost = attrs["cost_total"].fillna(0.0).to_numpy(float)
+    length = attrs["longueur"].to_numpy(float)
+    records = attrs.to_dict(orient="records")
+    for s, e in zip(starts, ends):
+        segs = [i for i in seg[s:e].tolist() if per_seg[i] is not None]
+        if not segs:
+            continue
+        if z >= detail_zoom:
+            feats = [([per_seg[i]], {"infra_id": ids[i], **_props(records[i])}) for i in segs]
+            yield int(z), int(tx[s]), int(ty[s]), LAYER_SEGMENTS, feats
+        else:
+            feats = []
+            sp = phase[segs]
+            for ph in np.unique(sp):
+                m = [i for i, p in zip(segs, sp) if p == ph]
+                feats.append(([per_seg[i] for i in m], {
+                    "phase": int(ph),
+                    "n_segments": len(m),
+                    "cost_total": float(cost[m].sum()),
+                    "longueur": float(length[m].sum()),
+                }))
+            yield int(z), int(tx[s]), int(ty[s]), LAYER_PHASES, feats
+
+
+def _tile_block(job: Tuple) -> List[Tuple[int, int, int, bytes]]:
+    """Worker : simplification, répartition par tuile et encodage d'un bloc de tuiles d'un zoom."""
+    z, keys, geoms, attrs, ids, detail_zoom, simplify_px = job
+    return _encode_tiles(list(_zoom_jobs(geoms, attrs, ids, z, detail_zoom, simplify_px, keys)))
+
+
+def _tile_blocks(per_zoom: Dict[int, Tuple[np.ndarray, np.ndarray]], geoms: np.ndarray, attrs: pd.DataFrame,
+                 ids: np.ndarray, detail_zoom: int, simplify_px: float, per_block: int) -> List[Tuple]:
+    """
+    Découpe chaque zoom en blocs de per_block tuiles contiguës, chacun avec les seuls tronçons
+    dont la bbox d'origine touche le bloc : la bbox simplifiée est incluse dans celle d'origine,
+    donc chaque bloc reproduit exactement ses tuiles.
+    """
+    blocks = []
+    for z, (seg, key) in per_zoom.items():
+        uniq = np.unique(key)
+        for block in np.array_split(uniq, -(-len(uniq) // per_block)):
+            segs = np.unique(seg[np.isin(key, block)])
+            blocks.append((z, block, geoms[segs], attrs.iloc[segs].reset_index(drop=True), ids[segs],
+                           detail_zoom, simplify_px))
+    return blocks
+
+
+def _write_mbtiles(path: Path, tiles: Iterable[Tuple[int, int, int, bytes]], metadata: Dict[str, str]) -> int:
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    n = 0
+    try:
+        with conn:
+            conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+            conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+            conn.executemany("INSERT INTO metadata VALUES (?, ?)", list(metadata.items()))
+            for z, x, y, data in tiles:
+                # MBTiles : rangées TMS (origine en bas)
+                conn.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (z, x, (1 << z) - 1 - y, data))
+                n += 1
+            conn.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    finally:
+        conn.close()
+    return n
+
+
+def build_mbtiles(infra_shp: str | Path,
+                  work_orders: pd.DataFrame,
+                  out_path: str | Path,
+                  min_zoom: int = 12,
+                  max_zoom: int = 18,
+                  detail_zoom: int = 15,
+                  simplify_px: float = 1.0,
+                  max_workers: int | None = None,
+                  fanout: pd.DataFrame | None = None) -> Dict[str, Any]:
+    """
+    Pyramide de tuiles vectorielles (MVT gzip) dans un fichier MBTiles (SQLite), lisible
+    directement par QGIS / MapLibre sans serveur :
+      - géométries reprojetées en EPSG:3857 et simplifiées à ~simplify_px pixel par zoom
+      - zooms < detail_zoom : couche "phases", tronçons fusionnés par (tuile, phase) avec nb, coût, longueur
+      - zooms >= detail_zoom : couche "segments", 1 entité par tronçon (phase, plan_order, coût, zone…)
+      - chaque zoom découpé en blocs de tuiles ; simplification, répartition par tuile et
+        encodage de chaque bloc dans un pool de processus
+    fanout (paires bâtiment × infra, cf. build_fanout) sert au comptage n_buildings ; il est
+    requis si work_orders est remplacé par des résumés segment_summary.
+    Nécessite shapely >= 2 (API vectorisée).
+    Retourne un petit rapport (nb de tuiles par zoom, chemin).
+    """
+    import shapely
+
+    gdf = _read_shp(infra_shp).explode(index_parts=False)
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    lonlat = gdf.to_crs(4326).total_bounds
+    length = shapely.length(gdf.geometry.to_numpy())        # CRS métrique d'origine (3857 déforme les longueurs)
+    gdf = gdf.to_crs(3857)
+    ids = _coalesce(pd.DataFrame(gdf.drop(columns="geometry")), COLS_INFRA)["infra_id"].astype(str).reset_index(drop=True)
+    attrs = _segment_attrs(ids, work_orders, fanout).reset_index(drop=True)
+    attrs["longueur"] = length
+    geoms = gdf.geometry.to_numpy()
+
+    # tuiles candidates par zoom (bbox d'origine) : taille des blocs et choix du pool
+    bounds = shapely.bounds(geoms)
+    per_zoom = {z: _tile_keys(bounds, z) for z in range(min_zoom, max_zoom + 1)}
+    n_candidates = sum(len(np.unique(key)) for _, key in per_zoom.values())
+    workers = max_workers or os.cpu_count() or 1
+    tiles = []
+    if workers <= 1 or n_candidates < MIN_TILES_FOR_POOL:
+        for z in per_zoom:
+            tiles.extend(_tile_block((z, None, geoms, attrs, ids.to_numpy(), detail_zoom, simplify_px)))
+    else:
+        per_block = max(1, -(-n_candidates // (workers * 4)))
+        blocks = _tile_blocks(per_zoom, geoms, attrs, ids.to_numpy(), detail_zoom, simplify_px, per_block)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for res in pool.map(_tile_block, blocks):
+                tiles.extend(res)
+
+    fields_seg = {"infra_id": "String", "phase": "Number", "plan_order": "Number", "cost_total": "Number",
+                  "time_total_h": "Number", "n_buildings": "Number", "longueur": "Number", "zone": "String"}
+    fields_ph = {"phase": "Number", "n_segments": "Number", "cost_total": "Number", "longueur": "Number"}
+    vector_layers = []
+    if min_zoom < detail_zoom:
+        vector_layers.append({"id": LAYER_PHASES, "fields": fields_ph,
+                              "minzoom": min_zoom, "maxzoom": min(detail_zoom - 1, max_zoom)})
+    if max_zoom >= detail_zoom:
+        vector_layers.append({"id": LAYER_SEGMENTS, "fields": fields_seg,
+                              "minzoom": max(detail_zoom, min_zoom), "maxzoom": max_zoom})
+    metadata = {
+        "name": "plan_raccordement",
+        "format": "pbf",
+        "type": "overlay",
+        "minzoom": str(min_zoom),
+        "maxzoom": str(max_zoom),
+        "bounds": ",".join(f"{v:.6f}" for v in lonlat),
+        "center": f"{(lonlat[0] + lonlat[2]) / 2:.6f},{(lonlat[1] + lonlat[3]) / 2:.6f},{min(max_zoom, detail_zoom)}",
+        "json": json.dumps({"vector_layers": vector_layers}),
+    }
+    p = Path(out_path); p.parent.mkdir(parents=True, exist_ok=True)
+    n = _write_mbtiles(p, tiles, metadata)
+    per_zoom = pd.Series([t[0] for t in tiles]).value_counts().sort_index()
+    return {"path": str(p), "n_tiles": n, "tiles_per_zoom": {int(k): int(v) for k, v in per_zoom.items()}}
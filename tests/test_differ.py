@@ -0,0 +1,45 @@
+# tests/test_differ.py
+from pathlib import Path
+import pandas as pd
+
+from src.ingestion.cleaner import _coalesce, COLS_BATS
+from src.ingestion.differ import diff_inputs, save_hashes
+
+INPUTS = Path(__file__).resolve().parents[1] / "data" / "inputs"
+
+
+def _delivery(path: Path) -> dict:
+    return {"bat": _coalesce(pd.read_csv(path), COLS_BATS)}
+
+
+def _diff(tmp_path: Path, before: Path, after: Path):
+    store = tmp_path / "hashes"
+    _, _, hashes = diff_inputs(_delivery(before), {"bat": COLS_BATS}, store)
+    for table, h in hashes.items():
+        save_hashes(h, store, table)
+    changes, report, _ = diff_inputs(_delivery(after), {"bat": COLS_BATS}, store)
+    return changes, report
+
+
+def test_blank_cell_marks_one_row(tmp_path):
+    # une cellule vide => nb_maisons relu en float : seule la ligne vidée doit changer
+    orig = pd.read_csv(INPUTS / "batiments.csv")
+    bat = orig.copy()
+    bat.loc[0, "nb_maisons"] = None
+    after = tmp_path / "batiments.csv"
+    bat.to_csv(after, index=False)
+
+    changes, report = _diff(tmp_path, INPUTS / "batiments.csv", after)
+
+    t = report["tables"]["bat"]
+    assert (t["added"], t["removed"], t["modified"]) == (0, 0, 1)
+    cell = changes["bat"]
+    assert len(cell) == 1
+    assert cell.iloc[0][["id_batiment", "column", "old_value", "new_value"]].tolist() == \
+        [str(orig.loc[0, "id_batiment"]), "nb_maisons", str(orig.loc[0, "nb_maisons"]), ""]
+    assert report["affected"]["id_batiment"]["count"] == 1
+
+
+def test_same_delivery_is_unchanged(tmp_path):
+    _, report = _diff(tmp_path, INPUTS / "batiments.csv", INPUTS / "batiments.csv")
+    assert report["unchanged"]
@@ -0,0 +1,48 @@
+# tests/test_readers.py
+from pathlib import Path
+import re
+import zipfile
+import openpyxl
+import pandas as pd
+
+from src.ingestion.readers import read_table
+
+COLUMNS = ["id_batiment", "nb_maisons", "libelle"]
+# cellule formule -> (type t, valeur en cache) injectés dans le XML : openpyxl n'écrit pas de cache
+CACHED = {"B5": ("", "6"), "C5": ("str", "calc &amp; co")}
+
+
+def _workbook(path: Path) -> Path:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["id_batiment", "nb_maisons", "libelle", "autre"])
+    ws.append(["E000001", 3, "a", None])
+    ws.append([123, 2.5, None, None])              # identifiant numérique dans une colonne texte
+    ws.append([None, None, None, "hors projection"])
+    ws.append(["E000004", "=B2*2", '=C2&"b"', None])
+    ws.append([None, None, None, None])            # ligne vide au milieu
+    ws.append([456.0, 1, "d", None])
+    ws.append([None, None, None, "dernière"])      # dernière ligne : seulement hors projection
+    wb.save(path)
+
+    with zipfile.ZipFile(path) as z:
+        files = {n: z.read(n) for n in z.namelist()}
+    sheet = files["xl/worksheets/sheet1.xml"].decode()
+    for ref, (t, v) in CACHED.items():
+        typ = f' t="{t}"' if t else ""
+        sheet = re.sub(rf'<c r="{ref}"[^>]*>(<f>.*?</f>)<v\s*/>', rf'<c r="{ref}"{typ}>\1<v>{v}</v>', sheet)
+    files["xl/worksheets/sheet1.xml"] = sheet.encode()
+    with zipfile.ZipFile(path, "w") as z:
+        for n, data in files.items():
+            z.writestr(n, data)
+    return path
+
+
+def test_stream_matches_read_excel(tmp_path):
+    p = _workbook(tmp_path / "bats.xlsx")
+    expected = pd.read_excel(p, engine="openpyxl", usecols=lambda c: c in COLUMNS)
+    for batch_size in (2, 50_000):                 # lots mélangés / lot unique
+        got = read_table(p, COLUMNS, batch_size=batch_size)
+        pd.testing.assert_frame_equal(got, expected)
+        assert [type(v) for v in got["id_batiment"].dropna()] == [type(v) for v in expected["id_batiment"].dropna()]
+        assert got["id_batiment"].astype(str).tolist() == expected["id_batiment"].astype(str).tolist()
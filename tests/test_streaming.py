@@ -0,0 +1,54 @@
+# tests/test_streaming.py
+from pathlib import Path
+import pandas as pd
+import pytest
+
+from src.ingestion.readers import read_table
+from src.ingestion.cleaner import clean_and_join, _coalesce, COLS_RESEAU, COLS_BATS, COLS_INFRA
+from src.ingestion.syncer import apply_business_csv
+from src.preparation.buildings_priority import add_building_priority
+from src.preparation.enrichments import enrich_costs_and_flags
+from src.analytics.plan_greedy import iter_plan_steps, batch_steps
+from src.analytics.work_organizer import build_work_orders, build_fanout, iter_phases, WorkOrderStream
+from src.analytics.curves import ExecutionTrace, compute_reconnection_curves
+
+ROOT = Path(__file__).resolve().parents[1]
+INPUTS = ROOT / "data" / "inputs"
+COSTS = ROOT / "configs" / "costs.yaml"
+
+
+@pytest.fixture(scope="module")
+def planned():
+    reseau_cols = [a for aliases in COLS_RESEAU.values() for a in aliases]
+    reseau = _coalesce(read_table(INPUTS / "reseau_en_arbre.xlsx", reseau_cols), COLS_RESEAU)
+    bat = _coalesce(read_table(INPUTS / "batiments.csv"), COLS_BATS)
+    infra = _coalesce(read_table(INPUTS / "infra.csv"), COLS_INFRA)
+    joined, _, bat_base = clean_and_join(reseau, bat, infra, coalesced=True)
+    df_enrich = enrich_costs_and_flags(apply_business_csv(joined, None), COSTS)
+    bat_prio = add_building_priority(bat_base)
+    plan_df = pd.DataFrame(list(iter_plan_steps(df_enrich, bat_prio)))
+    return df_enrich, bat_prio, plan_df
+
+
+@pytest.mark.parametrize("normalized", [False, True])
+def test_stream_phases_match_batch(planned, normalized):
+    df_enrich, bat_prio, plan_df = planned
+    batch, _, _ = build_work_orders(df_enrich, plan_df, COSTS, normalized=normalized)
+    fanout = build_fanout(df_enrich, plan_df) if normalized else None
+
+    stream = WorkOrderStream(df_enrich, batch_steps(plan_df.to_dict("records"), 16), COSTS, normalized=normalized)
+    trace, phases = ExecutionTrace(), []
+    for wo in iter_phases(stream):
+        assert wo["phase"].nunique() == 1          # une phase complète par lot
+        trace.add(wo)
+        phases.append(wo)
+    streamed = pd.concat(phases, ignore_index=True)
+
+    pd.testing.assert_frame_equal(streamed, batch, check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(stream.fanout(), build_fanout(df_enrich, plan_df))
+    steps_a, phases_a, markers_a = compute_reconnection_curves(plan_df, batch, bat_prio, fanout)
+    steps_b, phases_b, markers_b = compute_reconnection_curves(plan_df[["id_batiment", "nb_houses"]],
+                                                               trace, bat_prio, fanout)
+    pd.testing.assert_frame_equal(steps_a, steps_b)
+    pd.testing.assert_frame_equal(phases_a, phases_b)
+    assert markers_a == markers_b